@@ -0,0 +1,213 @@
+# Agregados exibidos no dashboard (métricas, comparações entre mercados e safras, hedge e fluxo de caixa),
+# sem dependência do Streamlit, reutilizados pela API local (api.py)
+import pandas as pd
+
+import cache
+
+
+def summarize_totals(data):
+    total_sacas = int(data['# Sacas'].sum())
+    total_revenue = float(data['Receita R$'].sum())
+    avg_price = total_revenue / total_sacas if total_sacas > 0 else 0
+    return {'Total de Sacas': total_sacas, 'Faturamento Total': total_revenue, 'Valor médio da saca': avg_price}
+
+
+def aggregate_by(data, dimension):
+    # Volume, faturamento e preço médio por dimensão (Cliente, Qualidade, ...)
+    agg_data = data.groupby(dimension, observed=True).agg({
+        '# Sacas': 'sum',
+        'Receita R$': 'sum'
+    }).reset_index()
+
+    agg_data['Preço Médio'] = agg_data['Receita R$'] / agg_data['# Sacas']
+    agg_data['Preço Médio'] = agg_data['Preço Médio'].round(2)
+    return agg_data
+
+
+def compare_markets(data):
+    # Agrupar por tipo de mercado
+    market_comp = data.groupby('Mercado', observed=True).agg({
+        '# Sacas': 'sum',
+        'Receita R$': 'sum'
+    }).reset_index()
+
+    # Calcular preço médio
+    market_comp['Preço Médio (R$/sc)'] = (market_comp['Receita R$'] / market_comp['# Sacas']).round(2)
+
+    # Calcular o total de sacas para percentuais
+    total_sacas = market_comp['# Sacas'].sum()
+    market_comp['Percentual'] = ((market_comp['# Sacas'] / total_sacas) * 100).round(1)
+    return market_comp
+
+
+def calculate_hedge_results(df_hedge, cotacao_dolar):
+    if df_hedge.empty:
+        return df_hedge
+
+    df_result = df_hedge.copy()
+
+    # Criar coluna de resultado se não existir
+    if 'Resultado Calculado R$' not in df_result.columns:
+        df_result['Resultado Calculado R$'] = 0.0
+
+    # Para operações LIQUIDADAS - usar coluna 'Resultado R$' se existir
+    if 'Status' in df_result.columns and 'Resultado R$' in df_result.columns:
+        mask_liquidado = df_result['Status'] == 'Liquidado'
+        df_result.loc[mask_liquidado, 'Resultado Calculado R$'] = df_result.loc[mask_liquidado, 'Resultado R$']
+
+    # Para operações Não Liquidadas - calcular com cotação atual
+    if 'Status' in df_result.columns:
+        mask_ativo = df_result['Status'] != 'Liquidado'
+
+        # Verificar se tem as colunas necessárias para cálculo
+        if all(col in df_result.columns for col in ['Preço (cts/lb)', 'Liq. (cts/lb)', '# Sacas']):
+            # Cálculo: (Liq - Preço) * Sacas * Dólar / 100
+            df_result.loc[mask_ativo, 'Resultado Calculado R$'] = (
+                    (df_result.loc[mask_ativo, 'Preço (cts/lb)']-df_result.loc[mask_ativo, 'Liq. (cts/lb)']) *
+                    df_result.loc[mask_ativo, '# Sacas'] * cotacao_dolar * 1.3228
+            )
+
+    return df_result
+
+
+# Dimensões disponíveis na comparação entre safras; o rollup de cada safra guarda o cruzamento de todas elas
+DIMENSOES_COMPARACAO = ['Cliente', 'Qualidade', 'Mercado']
+
+
+@cache.memoize
+def safra_rollup(safra, hash_particao, dolar_value, hash_curva, _df_safra):
+    # Sacas e faturamento da safra inteira por Cliente x Qualidade x Mercado, materializados uma vez por conteúdo da
+    # partição, cotação e curva de PTAX: filtros e comparações trabalham sobre esta tabela pequena, sem voltar às
+    # linhas de venda
+    return _df_safra.groupby(DIMENSOES_COMPARACAO, observed=True)[['# Sacas', 'Receita R$']].sum().reset_index()
+
+
+def filter_rollup(rollup, mercado=None, clientes=None, qualidades=None, incluir_estimativas=True):
+    # Mesmos filtros da barra lateral (filter_sales), aplicados às linhas do rollup
+    mask = pd.Series(True, index=rollup.index)
+    if mercado is not None:
+        mask &= rollup['Mercado'].isin(mercado)
+    if clientes is not None:
+        mask &= rollup['Cliente'].isin(clientes)
+    if qualidades is not None:
+        mask &= rollup['Qualidade'].astype(str).isin(qualidades)
+    if not incluir_estimativas:
+        mask &= rollup['Cliente'] != "Estoque"
+    return rollup[mask]
+
+
+def compare_safras(rollup_base, rollup_comparada, dimensao, mercado=None, clientes=None, qualidades=None,
+                   incluir_estimativas=True):
+    # Variação, crescimento e decomposição preço-mix-volume do faturamento entre duas safras, por dimensão, depois
+    # dos filtros da barra lateral. Efeito Volume + Efeito Mix + Efeito Preço = Δ Receita em cada linha
+    filtros = (mercado, clientes, qualidades, incluir_estimativas)
+    rollup_base, rollup_comparada = filter_rollup(rollup_base, *filtros), filter_rollup(rollup_comparada, *filtros)
+
+    def by_dimension(rollup):
+        return rollup.groupby(dimensao, observed=True)[['# Sacas', 'Receita R$']].sum()
+
+    base = by_dimension(rollup_base).rename(columns={'# Sacas': 'Sacas Base', 'Receita R$': 'Receita Base'})
+    comparada = by_dimension(rollup_comparada).rename(
+        columns={'# Sacas': 'Sacas Comparada', 'Receita R$': 'Receita Comparada'})
+    comp = base.join(comparada, how='outer').fillna(0.0)
+    comp.index = comp.index.astype(str)
+
+    qa, qb = comp['Sacas Base'], comp['Sacas Comparada']
+    ra, rb = comp['Receita Base'], comp['Receita Comparada']
+    pa, pb = ra / qa.where(qa > 0), rb / qb.where(qb > 0)
+
+    comp['Δ Sacas'] = qb - qa
+    comp['Cresc. Sacas (%)'] = ((qb / qa.where(qa > 0) - 1) * 100).round(1)
+    comp['Δ Receita'] = rb - ra
+    comp['Cresc. Receita (%)'] = ((rb / ra.where(ra > 0) - 1) * 100).round(1)
+    comp['Preço Médio Base'] = pa.round(2)
+    comp['Preço Médio Comparada'] = pb.round(2)
+    comp['Δ Preço Médio'] = (pb - pa).round(2)
+
+    # Itens novos na safra comparada usam o próprio preço como referência (sem efeito preço)
+    total_qa, total_qb = qa.sum(), qb.sum()
+    participacao_a = qa / total_qa if total_qa > 0 else qa * 0
+    participacao_b = qb / total_qb if total_qb > 0 else qb * 0
+    preco_referencia = pa.fillna(pb).fillna(0.0)
+
+    comp['Efeito Volume'] = (total_qb - total_qa) * participacao_a * preco_referencia
+    comp['Efeito Mix'] = total_qb * (participacao_b - participacao_a) * preco_referencia
+    comp['Efeito Preço'] = qb * (pb.fillna(0.0) - preco_referencia)
+
+    return comp.reset_index().sort_values('Δ Receita', key=abs, ascending=False).reset_index(drop=True)
+
+
+def summarize_price_mix(comparacao):
+    return {
+        'Receita Base': float(comparacao['Receita Base'].sum()),
+        'Efeito Volume': float(comparacao['Efeito Volume'].sum()),
+        'Efeito Mix': float(comparacao['Efeito Mix'].sum()),
+        'Efeito Preço': float(comparacao['Efeito Preço'].sum()),
+        'Receita Comparada': float(comparacao['Receita Comparada'].sum()),
+    }
+
+
+def filter_hedge_status(df_hedge, status_selected):
+    if status_selected == 'Todos' or 'Status' not in df_hedge.columns:
+        return df_hedge
+    return df_hedge[df_hedge['Status'] == status_selected]
+
+
+def summarize_hedge(df_hedge):
+    return {
+        'Contratos': len(df_hedge),
+        'Total de Sacas': int(df_hedge['# Sacas'].sum()) if '# Sacas' in df_hedge.columns else None,
+        'Resultado': float(df_hedge['Resultado Calculado R$'].sum())
+        if 'Resultado Calculado R$' in df_hedge.columns else None,
+    }
+
+
+# Função para distribuir os valores em parcelas mensais
+@cache.memoize
+def calculate_cashflow(chave_snapshot, _data):
+    # Cópia do dataframe para não alterar o original
+    df_cashflow = _data.copy()
+
+    # Converter Data Pagamento para datetime (garantir formato correto)
+    df_cashflow['Data Pagamento'] = pd.to_datetime(df_cashflow['Data Pagamento'], errors='coerce')
+
+    # Criar um DataFrame para armazenar todos os fluxos de caixa
+    cashflow_entries = []
+
+    for _, row in df_cashflow.iterrows():
+        if pd.notna(row['Data Pagamento']):
+            num_parcelas = row['Parcelas'] if pd.notna(row['Parcelas']) and row['Parcelas'] > 0 else 1
+            valor_por_parcela = row['Receita R$'] / num_parcelas
+
+            # Para cada parcela, criar uma entrada no fluxo de caixa
+            data_base = row['Data Pagamento']
+            for i in range(int(num_parcelas)):
+                data_parcela = data_base + pd.DateOffset(months=i)
+
+                cashflow_entries.append({
+                    'Data': data_parcela,
+                    'Valor': valor_por_parcela,
+                    'Cliente': row['Cliente'],
+                    'Mercado': row['Mercado'],
+                    'Safra': row['Safra'],
+                    'Parcela': i + 1,
+                    'Total Parcelas': num_parcelas
+                })
+
+    # Criar DataFrame com todas as entradas de fluxo de caixa
+    if cashflow_entries:
+        df_result = pd.DataFrame(cashflow_entries)
+
+        # Agrupar por mês para visualização mensal
+        df_result['Ano-Mês'] = df_result['Data'].dt.strftime('%b/%y')
+        monthly_cashflow = df_result.groupby('Ano-Mês').agg({
+            'Valor': 'sum',
+            'Data': 'min'  # Usamos min para preservar a ordem cronológica
+        }).reset_index()
+
+        # Garantir que os meses estejam em ordem cronológica
+        monthly_cashflow = monthly_cashflow.sort_values('Data')
+
+        return df_result, monthly_cashflow
+    else:
+        return pd.DataFrame(), pd.DataFrame()
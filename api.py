@@ -0,0 +1,200 @@
+# API HTTP local com os mesmos agregados do dashboard, em JSON, com ETag por hash do conteúdo.
+#
+# Uso:
+#   python api.py --porta 8502
+#   curl "http://127.0.0.1:8502/metricas?safras=2024&safras=2025&dolar=5.6&estoque=0"
+#
+# Rotas: /filtros, /metricas, /clientes, /mercados, /hedge, /cashflow
+# Parâmetros (repetíveis para listas): safras, mercado, clientes, qualidades, estoque (0/1), dolar, status (hedge)
+import argparse
+import hashlib
+import json
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import aggregates
+import cache
+import storage
+from dataset import SAFRAS_PADRAO, filter_sales, get_workbook_version, load_data, load_hedge_data, load_manifest, \
+    snapshot_key
+
+# Mesmos valores iniciais dos widgets do dashboard
+DOLAR_PADRAO = 5.50
+STATUS_HEDGE_PADRAO = 'Financeiro'
+STATUS_HEDGE = ['Todos', 'Liquidado', 'Financeiro', 'Físico']
+
+
+def frame_to_records(frame):
+    return json.loads(frame.to_json(orient='records', date_format='iso', force_ascii=False))
+
+
+def parse_filters(query, manifesto):
+    # Filtros ausentes seguem os padrões do dashboard: safra atual, todos os mercados, clientes e qualidades
+    parametros = parse_qs(query)
+    status = parametros.get('status', [STATUS_HEDGE_PADRAO])[0]
+    if status not in STATUS_HEDGE:
+        raise ValueError(f"status inválido: {status}")
+    # nan/inf nunca repetiriam a chave do cache (nan != nan): cada consulta criaria uma entrada nova
+    dolar = float(parametros.get('dolar', [DOLAR_PADRAO])[0])
+    if not math.isfinite(dolar) or dolar <= 0:
+        raise ValueError(f"dolar inválido: {dolar}")
+
+    return {
+        'safras': sorted(int(s) for s in parametros.get('safras', SAFRAS_PADRAO)),
+        'mercado': parametros.get('mercado', storage.manifest_values(manifesto, 'mercados')),
+        'clientes': parametros.get('clientes', storage.manifest_values(manifesto, 'clientes')),
+        'qualidades': parametros.get('qualidades', storage.manifest_values(manifesto, 'qualidades')),
+        'estoque': parametros.get('estoque', ['1'])[0] not in ('0', 'false', 'nao', 'não'),
+        'dolar': dolar,
+        'status': status,
+    }
+
+
+def filtered_sales(versao, filtros):
+    df = load_data(filtros['safras'], filtros['dolar'], versao)
+    return filter_sales(df, filtros['safras'], filtros['mercado'], filtros['clientes'], filtros['qualidades'],
+                        incluir_estimativas=filtros['estoque'])
+
+
+def filters_payload(versao, filtros, chave):
+    manifesto = load_manifest(versao)
+    return {
+        'safras': sorted(int(safra) for safra in manifesto['safras']),
+        'mercados': storage.manifest_values(manifesto, 'mercados'),
+        'clientes': storage.manifest_values(manifesto, 'clientes'),
+        'qualidades': storage.manifest_values(manifesto, 'qualidades'),
+        'status_hedge': STATUS_HEDGE,
+    }
+
+
+def metrics_payload(versao, filtros, chave):
+    return aggregates.summarize_totals(filtered_sales(versao, filtros))
+
+
+def clients_payload(versao, filtros, chave):
+    return frame_to_records(aggregates.aggregate_by(filtered_sales(versao, filtros), 'Cliente'))
+
+
+def markets_payload(versao, filtros, chave):
+    return frame_to_records(aggregates.compare_markets(filtered_sales(versao, filtros)))
+
+
+def hedge_payload(versao, filtros, chave):
+    df_hedge = aggregates.calculate_hedge_results(load_hedge_data(versao), filtros['dolar'])
+    if df_hedge.empty:
+        return {'resumo': aggregates.summarize_hedge(df_hedge), 'contratos': []}
+
+    df_hedge = aggregates.filter_hedge_status(df_hedge, filtros['status'])
+    return {'resumo': aggregates.summarize_hedge(df_hedge), 'contratos': frame_to_records(df_hedge)}
+
+
+def cashflow_payload(versao, filtros, chave):
+    _, monthly_cashflow = aggregates.calculate_cashflow(chave, filtered_sales(versao, filtros))
+    if monthly_cashflow.empty:
+        return []
+
+    monthly_cashflow = monthly_cashflow.assign(**{'Valor Acumulado': monthly_cashflow['Valor'].cumsum()})
+    return frame_to_records(monthly_cashflow)
+
+
+ROTAS = {
+    '/filtros': filters_payload,
+    '/metricas': metrics_payload,
+    '/clientes': clients_payload,
+    '/mercados': markets_payload,
+    '/hedge': hedge_payload,
+    '/cashflow': cashflow_payload,
+}
+
+
+@cache.memoize
+def render(rota, chave, status, _filtros):
+    # Corpo JSON e ETag ficam no mesmo cache dos dados: uma nova consulta com os mesmos filtros não recalcula nada
+    filtros = _filtros
+    dados = ROTAS[rota](chave[0], filtros, chave)
+
+    corpo = json.dumps({'filtros': filtros, 'dados': dados}, ensure_ascii=False, default=str).encode('utf-8')
+    etag = '"' + hashlib.sha256(corpo).hexdigest()[:32] + '"'
+    return corpo, etag
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidatas = [valor.strip().removeprefix('W/') for valor in if_none_match.split(',')]
+    return '*' in candidatas or etag in candidatas
+
+
+class AggregatesHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path not in ROTAS:
+            return self.send_json(404, {'erro': f"rota desconhecida: {url.path}", 'rotas': sorted(ROTAS)})
+
+        versao = get_workbook_version()
+        try:
+            manifesto = load_manifest(versao)
+        except Exception as e:
+            return self.send_failure(versao, e)
+        try:
+            filtros = parse_filters(url.query, manifesto)
+        except ValueError as e:
+            return self.send_json(400, {'erro': str(e)})
+
+        chave = snapshot_key(versao, filtros['dolar'], filtros['safras'], filtros['estoque'], filtros['mercado'],
+                             filtros['clientes'], filtros['qualidades'])
+        try:
+            corpo, etag = render(url.path, chave, filtros['status'], filtros)
+        except Exception as e:
+            return self.send_failure(versao, e)
+
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def send_failure(self, versao, erro):
+        # Erro no cálculo vira resposta JSON em vez de derrubar a conexão; sem planilha, o serviço está indisponível
+        self.log_error("%s: %r", self.path, erro)
+        if versao is None:
+            return self.send_json(503, {'erro': "planilha de vendas indisponível"})
+        return self.send_json(500, {'erro': f"{type(erro).__name__}: {erro}"})
+
+    def send_json(self, codigo, conteudo):
+        corpo = json.dumps(conteudo, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API local com os agregados do dashboard de vendas de café")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8502)
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer((args.host, args.porta), AggregatesHandler)
+    print(f"API de agregados em http://{args.host}:{args.porta} (rotas: {', '.join(sorted(ROTAS))})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
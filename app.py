@@ -3,6 +3,18 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+import aggregates
+import cache
+import feed
+import hedge_coverage
+import receivables
+import risk
+import schema
+import storage
+from dataset import (SAFRAS_PADRAO, filter_sales, get_last_update_date, get_workbook_version, load_data,
+                     load_futures_data, load_hedge_data, load_historical_data, load_manifest, load_partitions,
+                     open_snapshot, ptax_curve_hash, snapshot_key)
+
 # Configurações da página
 st.set_page_config(page_title="Dashboard de Vendas de Café", page_icon="☕", layout="wide")
 
@@ -46,6 +58,11 @@ client_info = {
     },
 }
 
+# Exposição máxima a receber (R$) por Credit Score, na seção de recebíveis do CashFlow; clientes sem score no
+# client_info ficam sem limite. Valores de exemplo, usados só quando VENDAS_CAFE_LIMITES_CREDITO não está definida
+limites_credito_exemplo = {5: 5_000_000, 4: 3_000_000, 3: 1_500_000, 2: 750_000, 1: 300_000}
+limites_credito, limites_configurados = receivables.load_credit_limits(limites_credito_exemplo)
+
 
 #Cotação do dólar na sidebar
 st.sidebar.title("Configurações")
@@ -57,74 +74,19 @@ cotacao_dolar = st.sidebar.number_input(
 )
 
 
-# Função para buscar a data da última atualização
-@st.cache_data(show_spinner=False)
-def get_last_update_date():
-    try:
-        df_futuros = pd.read_excel("vendas_cafe_em_reais.xlsx", sheet_name="futuros")
-        # Pegar o nome da coluna D (que é onde está a data)
-        last_update = df_futuros.columns[3]  # Nome da coluna D
-
-        # Tentar converter para datetime
-        try:
-            last_update = pd.to_datetime(last_update, format='%d/%m/%y')
-            return last_update.strftime("%d/%m/%Y")
-        except:
-            return str(last_update)
-    except Exception as e:
-        return "Data não disponível"
-
 # Buscar e exibir a data da última atualização
-ultima_atualizacao = get_last_update_date()
+versao_planilha = get_workbook_version()
+ultima_atualizacao = get_last_update_date(versao_planilha)
 st.sidebar.markdown(f"<small>📅 Última atualização: {ultima_atualizacao}</small>", unsafe_allow_html=True)
 
 
-@st.cache_data(show_spinner=False)
-def load_data(dolar_value):
-    df = pd.read_excel("vendas_cafe_em_reais.xlsx", sheet_name="Sheet2")
-
-    df["Peneira"] = df["Peneira"].astype(str)
-    df['PTAX'] = df['PTAX'].fillna(dolar_value)
-
-    # Recalcular os preços em reais com base na cotação do dólar
-    mask_preco_rs_vazio = df['Preço (R$/sc)'].isna()
-    df.loc[mask_preco_rs_vazio, 'Preço (R$/sc)'] = df.loc[mask_preco_rs_vazio, 'Preço (u$/sc)'] * df.loc[
-        mask_preco_rs_vazio, 'PTAX']
-
-    # Calculando a Receita R$ onde está ausente
-    mask_receita_rs_vazia = df['Receita R$'].isna()
-    df.loc[mask_receita_rs_vazia, 'Receita R$'] = df.loc[mask_receita_rs_vazia, 'Preço (R$/sc)'] * df.loc[
-        mask_receita_rs_vazia, '# Sacas']
-
-    # Converter 'Data Pagamento' para datetime
-    df['Data Pagamento'] = pd.to_datetime(df['Data Pagamento'], errors='coerce')
-
-    return df
-
-@st.cache_data(show_spinner=False)
-def load_hedge_data():
-    try:
-        df_hedge = pd.read_excel("vendas_cafe_em_reais.xlsx", sheet_name="hedge")
-        return df_hedge
-    except Exception as e:
-        return pd.DataFrame()
-
-@st.cache_data(show_spinner=False)
-def load_futures_data():
-    try:
-        df_futuros = pd.read_excel("vendas_cafe_em_reais.xlsx", sheet_name="futuros")
-        return df_futuros
-    except Exception as e:
-        return pd.DataFrame()
-
-
-# Passar a cotação do dólar como parâmetro para a função load_data
-df = load_data(cotacao_dolar)
+# O manifesto das partições traz as safras e as dimensões de todas elas, sem carregar os dados
+manifesto = load_manifest(versao_planilha)
 
 # Definir paletas de cores consistentes para todas as categorias
-peneiras = sorted(list(df['Peneira'].astype(str).unique()))
-clientes = sorted(list(df['Cliente'].unique()))
-qualidades = sorted(list(df['Qualidade'].unique()))
+peneiras = storage.manifest_values(manifesto, 'peneiras')
+clientes = storage.manifest_values(manifesto, 'clientes')
+qualidades = storage.manifest_values(manifesto, 'qualidades')
 
 # Usar paletas de cores fixas para garantir consistência
 COLORS_PENEIRAS = (px.colors.qualitative.Prism + px.colors.qualitative.Safe)[:len(peneiras)]
@@ -144,18 +106,21 @@ st.title("☕ Dashboard de Vendas de Café")
 st.sidebar.title("Filtros")
 
 safras = st.sidebar.multiselect("Safras",
-                                options=sorted(df['Safra'].unique()),
-                                default=[2025])
+                                options=sorted(int(safra) for safra in manifesto['safras']),
+                                default=SAFRAS_PADRAO)
+
+# Passar as safras selecionadas, a cotação do dólar e a versão da planilha para a função load_data
+df = load_data(safras, cotacao_dolar, versao_planilha)
 
 incluir_estimativas = st.sidebar.checkbox("📈 Incluir Estoque", value=True)
 
 mercado = st.sidebar.multiselect("Mercado",
-                                 options=sorted(df['Mercado'].unique()),
-                                 default=sorted(df['Mercado'].unique()))
+                                 options=storage.manifest_values(manifesto, 'mercados'),
+                                 default=storage.manifest_values(manifesto, 'mercados'))
 
 clientes = st.sidebar.multiselect("Clientes",
-                                  options=sorted(df['Cliente'].unique()),
-                                  default=sorted(df['Cliente'].unique()))
+                                  options=clientes,
+                                  default=clientes)
 
 selected_clients_in_info = [cliente for cliente in clientes if cliente in client_info]
 if selected_clients_in_info:
@@ -193,34 +158,28 @@ if selected_clients_in_info:
 
 
 qualidades = st.sidebar.multiselect("Qualidade",
-                                    options=sorted([str(p) for p in df['Qualidade'].unique() if pd.notna(p)]),
-                                    default=sorted([str(p) for p in df['Qualidade'].unique() if pd.notna(p)]))
+                                    options=qualidades,
+                                    default=qualidades)
 
-mask = (df['Safra'].isin(safras) &
-        df['Cliente'].isin(clientes) &
-        df['Peneira'].astype(str).isin(peneiras) &
-        df['Qualidade'].astype(str).isin(qualidades) &
-        df['Mercado'].isin(mercado))
-if not incluir_estimativas:
-    mask &= df['Cliente'] != "Estoque"
-df_filtered = df[mask]
+df_filtered = filter_sales(df, safras, mercado, clientes, qualidades, peneiras, incluir_estimativas)
+
+# Identificador barato do snapshot filtrado, usado como chave de cache no lugar do próprio DataFrame
+chave_filtros = snapshot_key(versao_planilha, cotacao_dolar, safras, incluir_estimativas, mercado, clientes, qualidades)
 
 
 def display_metrics(data):
+    totais = aggregates.summarize_totals(data)
     cols = st.columns(3)
     with cols[0]:
-        total_sacas = int(data['# Sacas'].sum())
-        st.metric("Total de Sacas", f"{total_sacas:,}")
+        st.metric("Total de Sacas", f"{totais['Total de Sacas']:,}")
     with cols[1]:
-        total_revenue = data['Receita R$'].sum()
-        st.metric("Faturamento Total", f"R$ {total_revenue:,.0f}")
+        st.metric("Faturamento Total", f"R$ {totais['Faturamento Total']:,.0f}")
     with cols[2]:
-        avg_price = total_revenue / total_sacas if total_sacas > 0 else 0
-        st.metric("Valor médio da saca", f"R$ {avg_price:.2f}/sc")
+        st.metric("Valor médio da saca", f"R$ {totais['Valor médio da saca']:.2f}/sc")
 
 def create_volume_chart(data, dimension):
     # Garantir que usamos o COLOR_MAP global para consistência de cores
-    volume_data = data.groupby(dimension)['# Sacas'].sum().sort_values(ascending=True).reset_index()
+    volume_data = data.groupby(dimension, observed=True)['# Sacas'].sum().sort_values(ascending=True).reset_index()
 
     # Usar mapeamento de cores explícito para garantir consistência
     fig = px.bar(volume_data,
@@ -236,13 +195,7 @@ def create_volume_chart(data, dimension):
 
 def create_price_chart(data, dimension):
     # Garantir que usamos o COLOR_MAP global para consistência de cores
-    price_data = data.groupby(dimension).agg({
-        '# Sacas': 'sum',
-        'Receita R$': 'sum'
-    }).reset_index()
-
-    price_data['Preço Médio'] = price_data['Receita R$'] / price_data['# Sacas']
-    price_data['Preço Médio'] = price_data['Preço Médio'].round(2)
+    price_data = aggregates.aggregate_by(data, dimension)
 
     # Usar mapeamento de cores explícito para garantir consistência
     fig = px.scatter(price_data,
@@ -260,7 +213,7 @@ def create_price_chart(data, dimension):
 
 def create_revenue_chart(data, dimension):
     # Garantir que usamos o COLOR_MAP global para consistência de cores
-    revenue_data = data.groupby(dimension)['Receita R$'].sum().sort_values(ascending=True).reset_index()
+    revenue_data = data.groupby(dimension, observed=True)['Receita R$'].sum().sort_values(ascending=True).reset_index()
 
     # Usar mapeamento de cores explícito para garantir consistência
     fig = px.bar(revenue_data,
@@ -276,7 +229,7 @@ def create_revenue_chart(data, dimension):
 
 def create_pie_chart(data, dimension):
     # Garantir que usamos o COLOR_MAP global para consistência de cores
-    pie_data = data.groupby(dimension)['# Sacas'].sum().reset_index()
+    pie_data = data.groupby(dimension, observed=True)['# Sacas'].sum().reset_index()
     total = pie_data['# Sacas'].sum()
     pie_data['Percentual'] = (pie_data['# Sacas'] / total * 100).round(0)
 
@@ -315,18 +268,8 @@ def create_market_comparison(data):
         )
         return fig
 
-    # Agrupar por tipo de mercado (resto do código permanece igual)
-    market_comp = data.groupby('Mercado').agg({
-        '# Sacas': 'sum',
-        'Receita R$': 'sum'
-    }).reset_index()
-
-    # Calcular preço médio
-    market_comp['Preço Médio (R$/sc)'] = (market_comp['Receita R$'] / market_comp['# Sacas']).round(2)
-
-    # Calcular o total de sacas para percentuais
-    total_sacas = market_comp['# Sacas'].sum()
-    market_comp['Percentual'] = ((market_comp['# Sacas'] / total_sacas) * 100).round(1)
+    # Agrupar por tipo de mercado, com preço médio e percentual de sacas
+    market_comp = aggregates.compare_markets(data)
 
     # Formatar o texto para exibição
     market_comp['text'] = market_comp['# Sacas'].apply(lambda x: f"{int(x):,}")  # Formatar como inteiro
@@ -382,35 +325,6 @@ def create_market_comparison(data):
 
     return fig
 
-def calculate_hedge_results(df_hedge, cotacao_dolar):
-    if df_hedge.empty:
-        return df_hedge
-
-    df_result = df_hedge.copy()
-
-    # Criar coluna de resultado se não existir
-    if 'Resultado Calculado R$' not in df_result.columns:
-        df_result['Resultado Calculado R$'] = 0.0
-
-    # Para operações LIQUIDADAS - usar coluna 'Resultado R$' se existir
-    if 'Status' in df_result.columns and 'Resultado R$' in df_result.columns:
-        mask_liquidado = df_result['Status'] == 'Liquidado'
-        df_result.loc[mask_liquidado, 'Resultado Calculado R$'] = df_result.loc[mask_liquidado, 'Resultado R$']
-
-    # Para operações Não Liquidadas - calcular com cotação atual
-    if 'Status' in df_result.columns:
-        mask_ativo = df_result['Status'] != 'Liquidado'
-
-        # Verificar se tem as colunas necessárias para cálculo
-        if all(col in df_result.columns for col in ['Preço (cts/lb)', 'Liq. (cts/lb)', '# Sacas']):
-            # Cálculo: (Liq - Preço) * Sacas * Dólar / 100
-            df_result.loc[mask_ativo, 'Resultado Calculado R$'] = (
-                    (df_result.loc[mask_ativo, 'Preço (cts/lb)']-df_result.loc[mask_ativo, 'Liq. (cts/lb)']) *
-                    df_result.loc[mask_ativo, '# Sacas'] * cotacao_dolar * 1.3228
-            )
-
-    return df_result
-
 def create_hedge_chart(df_hedge, df_futuros):
     fig = go.Figure()
 
@@ -549,13 +463,85 @@ def create_hedge_chart(df_hedge, df_futuros):
     return fig
 
 
+def create_coverage_chart(ladder):
+    fig = go.Figure()
+
+    # Barras: volume físico em U$ x sacas cobertas por hedge em aberto, no mesmo mês
+    fig.add_trace(go.Bar(x=ladder['Data'], y=ladder['Sacas Físicas'], name='Sacas Físicas (U$)',
+                         marker_color='#8B4513'))
+    fig.add_trace(go.Bar(x=ladder['Data'], y=ladder['Sacas Hedge'], name='Sacas Hedge', marker_color='gray'))
+
+    # Linha: cobertura acumulada no eixo secundário
+    fig.add_trace(go.Scatter(x=ladder['Data'], y=ladder['Cobertura Acumulada (%)'], name='Cobertura Acumulada (%)',
+                             mode='lines+markers', line=dict(color='green', width=3), yaxis='y2'))
 
-tab1, tab4, tab5, tab7, tab6 = st.tabs([
+    fig.update_layout(
+        title="Cobertura do Hedge por Mês",
+        xaxis_title="Mês (pagamento / vencimento)",
+        yaxis_title="Sacas",
+        yaxis2=dict(title="Cobertura Acumulada (%)", overlaying='y', side='right', rangemode='tozero'),
+        barmode='group',
+        height=450,
+        legend=dict(yanchor="top", y=0.99, xanchor="left", x=0.01)
+    )
+
+    return fig
+
+
+def create_price_mix_chart(resumo, safra_base, safra_comparada):
+    # Cascata do faturamento: safra base -> efeitos volume, mix e preço -> safra comparada
+    fig = go.Figure(go.Waterfall(
+        x=[f"Safra {safra_base}", "Volume", "Mix", "Preço", f"Safra {safra_comparada}"],
+        y=[resumo['Receita Base'], resumo['Efeito Volume'], resumo['Efeito Mix'], resumo['Efeito Preço'],
+           resumo['Receita Comparada']],
+        measure=['absolute', 'relative', 'relative', 'relative', 'total'],
+        text=[f"R$ {valor:,.0f}" for valor in resumo.values()],
+        textposition='outside',
+        increasing=dict(marker_color='green'),
+        decreasing=dict(marker_color='red'),
+        totals=dict(marker_color='#8B4513')
+    ))
+    fig.update_layout(title="Decomposição do Faturamento (Volume, Mix e Preço)", yaxis_title="Receita (R$)",
+                      height=500, showlegend=False)
+    return fig
+
+
+# Reexecuta só este trecho a cada intervalo: lê os ticks novos e revaloriza os contratos em aberto, sem reler a planilha
+@st.fragment(run_every=feed.INTERVALO_PADRAO_S)
+def live_hedge_panel(feed_ao_vivo, fig_base, cotacao_dolar):
+    feed_ao_vivo.poll()
+    historico = feed_ao_vivo.history(cotacao_dolar)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        ultimo = feed_ao_vivo.last_price()
+        st.metric("KC=F ao Vivo", f"{ultimo:.2f} cts/lb" if ultimo is not None else "Aguardando ticks")
+    with col2:
+        st.metric("Resultado ao Vivo (em aberto)",
+                  f"R$ {historico['Resultado R$'].iloc[-1]:,.0f}" if not historico.empty else "N/A")
+    with col3:
+        st.metric("Ticks no Buffer", f"{len(historico):,}")
+
+    # Figura base (planilha) copiada e acrescida apenas da série ao vivo
+    fig = go.Figure(fig_base)
+    if not historico.empty:
+        fig.add_trace(go.Scatter(x=historico['Data'], y=historico['KC=F'], mode='lines', name='KC=F ao Vivo',
+                                 line=dict(color='orange', width=3)))
+    st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("Contratos em aberto revalorizados"):
+        st.dataframe(feed_ao_vivo.revalue(cotacao_dolar), use_container_width=True)
+
+
+
+tab1, tab4, tab5, tab9, tab7, tab6, tab8 = st.tabs([
     '📊 Consolidado',
     '✨ Por Qualidade',
     '🌍 Exportação vs Mercado Interno',
+    '📅 Safra x Safra',
     '💰 CashFlow',
     '🔄 Hedge',
+    '🎲 Risco',
 ])
 
 with tab1:
@@ -633,19 +619,82 @@ with tab5:
         st.warning(
             "Não há dados suficientes para exibir a comparação.")
 
+with tab9:
+    st.markdown("### Comparação entre Safras")
+    st.caption("Compara quaisquer duas safras com os filtros de mercado, clientes, qualidade e estoque da sidebar")
+
+    safras_disponiveis = sorted(int(safra) for safra in manifesto['safras'])
+    if len(safras_disponiveis) < 2:
+        st.warning("São necessárias ao menos duas safras para a comparação.")
+    else:
+        # Por padrão, a safra padrão do dashboard contra a anterior
+        indice_comparada = (safras_disponiveis.index(SAFRAS_PADRAO[-1]) if SAFRAS_PADRAO[-1] in safras_disponiveis
+                            else len(safras_disponiveis) - 1)
+        indice_comparada = max(indice_comparada, 1)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            safra_base = st.selectbox("Safra base", safras_disponiveis, index=indice_comparada - 1, key="safra_base")
+        with col2:
+            safra_comparada = st.selectbox("Safra comparada", safras_disponiveis, index=indice_comparada,
+                                           key="safra_comparada")
+        with col3:
+            dimensao_comparacao = st.selectbox("Comparar por", aggregates.DIMENSOES_COMPARACAO,
+                                               key="dimensao_comparacao")
+
+        # Rollups por safra em cache (um por partição e cotação); filtros, dimensão e par de safras só filtram e
+        # juntam tabelas já agregadas
+        hash_curva = ptax_curve_hash(versao_planilha)
+        rollups = {
+            safra: aggregates.safra_rollup(safra, manifesto['safras'][str(safra)]['hash'], cotacao_dolar, hash_curva,
+                                           parte)
+            for safra, parte in load_partitions([safra_base, safra_comparada], cotacao_dolar, versao_planilha).items()
+        }
+        comparacao = aggregates.compare_safras(rollups[safra_base], rollups[safra_comparada], dimensao_comparacao,
+                                               mercado, clientes, qualidades, incluir_estimativas)
+
+        if comparacao.empty:
+            st.info("📝 Nenhuma venda nas safras selecionadas com os filtros atuais")
+        else:
+            resumo = aggregates.summarize_price_mix(comparacao)
+            sacas_base, sacas_comparada = comparacao['Sacas Base'].sum(), comparacao['Sacas Comparada'].sum()
+            preco_base = resumo['Receita Base'] / sacas_base if sacas_base > 0 else 0
+            preco_comparada = resumo['Receita Comparada'] / sacas_comparada if sacas_comparada > 0 else 0
+
+            cols = st.columns(3)
+            with cols[0]:
+                st.metric("Sacas", f"{sacas_comparada:,.0f}", delta=f"{sacas_comparada - sacas_base:,.0f}")
+            with cols[1]:
+                st.metric("Faturamento", f"R$ {resumo['Receita Comparada']:,.0f}",
+                          delta=f"R$ {resumo['Receita Comparada'] - resumo['Receita Base']:,.0f}")
+            with cols[2]:
+                st.metric("Preço Médio", f"R$ {preco_comparada:.2f}/sc",
+                          delta=f"R$ {preco_comparada - preco_base:.2f}/sc")
+
+            st.plotly_chart(create_price_mix_chart(resumo, safra_base, safra_comparada), use_container_width=True)
+
+            formato_comparacao = {col: '{:,.0f}' for col in ['Sacas Base', 'Sacas Comparada', 'Δ Sacas']}
+            formato_comparacao.update({col: 'R$ {:,.0f}' for col in [
+                'Receita Base', 'Receita Comparada', 'Δ Receita', 'Efeito Volume', 'Efeito Mix', 'Efeito Preço']})
+            formato_comparacao.update({col: 'R$ {:,.2f}' for col in [
+                'Preço Médio Base', 'Preço Médio Comparada', 'Δ Preço Médio']})
+            formato_comparacao.update({'Cresc. Sacas (%)': '{:.1f}%', 'Cresc. Receita (%)': '{:.1f}%'})
+            st.dataframe(comparacao.set_index(dimensao_comparacao).style.format(formato_comparacao, na_rep='-'),
+                         use_container_width=True)
+
 with tab6:
     st.markdown("### Hedge")
 
     # Carregar dados da planilha hedge
-    df_hedge_raw = load_hedge_data()
-    df_futuros_raw = load_futures_data()
+    df_hedge_raw = load_hedge_data(versao_planilha)
+    df_futuros_raw = load_futures_data(versao_planilha)
 
     if df_hedge_raw.empty:
         st.warning("⚠️ Não foi possível carregar dados da aba 'hedge'")
 
     else:
         # Calcular resultados
-        df_hedge_processed = calculate_hedge_results(df_hedge_raw, cotacao_dolar)
+        df_hedge_processed = aggregates.calculate_hedge_results(df_hedge_raw, cotacao_dolar)
 
         # === FILTRO SIMPLES ===
         st.markdown("#### 🔍 Filtros")
@@ -658,10 +707,7 @@ with tab6:
                 key="hedge_status_simple"
             )
 
-            if status_selected == 'Todos':
-                df_hedge_filtered = df_hedge_processed
-            else:
-                df_hedge_filtered = df_hedge_processed[df_hedge_processed['Status'] == status_selected]
+            df_hedge_filtered = aggregates.filter_hedge_status(df_hedge_processed, status_selected)
         else:
             df_hedge_filtered = df_hedge_processed
 
@@ -708,9 +754,25 @@ with tab6:
 
         # === GRÁFICO ===
         st.markdown("#### 📈 Comparação: Futuros vs Hedge")
+        modo_ao_vivo = st.toggle("📡 Futuros ao vivo", key="futuros_ao_vivo")
+        feed_ao_vivo = None
+        if modo_ao_vivo:
+            # Só as fontes configuradas no servidor (VENDAS_CAFE_FEED)
+            fonte_ticks = feed.FONTE_PADRAO
+            if len(feed.FONTES_PERMITIDAS) > 1:
+                fonte_ticks = st.selectbox("Fonte dos ticks", feed.FONTES_PERMITIDAS, key="fonte_ticks")
+            try:
+                feed_ao_vivo = feed.shared_feed(fonte_ticks)
+            except (ValueError, OSError) as e:
+                st.error(f"Erro ao abrir a fonte de ticks: {e}")
+
         try:
             fig = create_hedge_chart(df_hedge_filtered, df_futuros_raw)
-            st.plotly_chart(fig, use_container_width=True)
+            if feed_ao_vivo is not None:
+                feed_ao_vivo.set_contracts(df_hedge_raw, versao_planilha)
+                live_hedge_panel(feed_ao_vivo, fig, cotacao_dolar)
+            else:
+                st.plotly_chart(fig, use_container_width=True)
         except Exception as e:
             st.error(f"Erro ao criar gráfico: {e}")
 
@@ -762,59 +824,46 @@ with tab6:
         else:
             st.info("📝 Nenhum contrato encontrado com os filtros selecionados")
 
-with tab7:
-    st.markdown("### Fluxo de Caixa")
+        # === ESCADA DE COBERTURA ===
+        st.markdown("#### 🪜 Cobertura por Mês")
+        st.caption("Vendas em U$ (filtros da sidebar) por mês de pagamento x contratos Financeiro/Físico por "
+                   "vencimento")
 
-    # Função para distribuir os valores em parcelas mensais (mantida igual)
-    @st.cache_data
-    def calculate_cashflow(data):
-        # Cópia do dataframe para não alterar o original
-        df_cashflow = data.copy()
-
-        # Converter Data Pagamento para datetime (garantir formato correto)
-        df_cashflow['Data Pagamento'] = pd.to_datetime(df_cashflow['Data Pagamento'], errors='coerce')
-
-        # Criar um DataFrame para armazenar todos os fluxos de caixa
-        cashflow_entries = []
-
-        for _, row in df_cashflow.iterrows():
-            if pd.notna(row['Data Pagamento']):
-                num_parcelas = row['Parcelas'] if pd.notna(row['Parcelas']) and row['Parcelas'] > 0 else 1
-                valor_por_parcela = row['Receita R$'] / num_parcelas
-
-                # Para cada parcela, criar uma entrada no fluxo de caixa
-                data_base = row['Data Pagamento']
-                for i in range(int(num_parcelas)):
-                    data_parcela = data_base + pd.DateOffset(months=i)
-
-                    cashflow_entries.append({
-                        'Data': data_parcela,
-                        'Valor': valor_por_parcela,
-                        'Cliente': row['Cliente'],
-                        'Mercado': row['Mercado'],
-                        'Safra': row['Safra'],
-                        'Parcela': i + 1,
-                        'Total Parcelas': num_parcelas
-                    })
-
-        # Criar DataFrame com todas as entradas de fluxo de caixa
-        if cashflow_entries:
-            df_result = pd.DataFrame(cashflow_entries)
-
-            # Agrupar por mês para visualização mensal
-            df_result['Ano-Mês'] = df_result['Data'].dt.strftime('%b/%y')
-            monthly_cashflow = df_result.groupby('Ano-Mês').agg({
-                'Valor': 'sum',
-                'Data': 'min'  # Usamos min para preservar a ordem cronológica
-            }).reset_index()
-
-            # Garantir que os meses estejam em ordem cronológica
-            monthly_cashflow = monthly_cashflow.sort_values('Data')
-
-            return df_result, monthly_cashflow
+        ladder = hedge_coverage.coverage_ladder(versao_planilha, tuple(safras), tuple(mercado), tuple(clientes),
+                                                tuple(qualidades), incluir_estimativas,
+                                                load_partitions(safras, cotacao_dolar, versao_planilha), manifesto,
+                                                df_hedge_raw)
+
+        if ladder.empty:
+            st.info("📝 Nenhuma venda em U$ ou contrato em aberto para montar a cobertura")
         else:
-            return pd.DataFrame(), pd.DataFrame()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Cobertura Total", f"{hedge_coverage.total_coverage(ladder):.1f}%",
+                          help="Físico coberto mês a mês: hedge de meses sem venda não entra na cobertura")
+            with col2:
+                st.metric("Sacas Descobertas", f"{ladder['Sacas Descobertas'].sum():,.0f}")
+            with col3:
+                st.metric("Exposição Descoberta", f"U$ {ladder['Exposição Descoberta U$'].sum():,.0f}")
+
+            st.plotly_chart(create_coverage_chart(ladder), use_container_width=True)
+
+            st.dataframe(
+                ladder.drop(columns=['Data']).set_index('Ano-Mês').style.format({
+                    'Sacas Físicas': '{:,.0f}',
+                    'Receita U$': 'U$ {:,.0f}',
+                    'Sacas Hedge': '{:,.0f}',
+                    'Sacas Cobertas': '{:,.0f}',
+                    'Cobertura (%)': '{:.1f}%',
+                    'Sacas Descobertas': '{:,.0f}',
+                    'Exposição Descoberta U$': 'U$ {:,.0f}',
+                    'Cobertura Acumulada (%)': '{:.1f}%',
+                }, na_rep='-'),
+                use_container_width=True
+            )
 
+with tab7:
+    st.markdown("### Fluxo de Caixa")
 
     # Verificar se há dados com Data Pagamento
     if df_filtered.empty or df_filtered['Data Pagamento'].notna().sum() == 0:
@@ -822,7 +871,7 @@ with tab7:
             "Não há dados de fluxo de caixa disponíveis para os filtros selecionados.")
     else:
         # Calcular o fluxo de caixa
-        df_cashflow_detailed, monthly_cashflow = calculate_cashflow(df_filtered)
+        df_cashflow_detailed, monthly_cashflow = aggregates.calculate_cashflow(chave_filtros, df_filtered)
 
         if not monthly_cashflow.empty:
             # Adicionar seletor de período para filtrar o gráfico
@@ -966,9 +1015,180 @@ with tab7:
                     use_container_width=True
                 )
 
+            # === RECEBÍVEIS POR CLIENTE ===
+            st.markdown("#### 🧾 Recebíveis por Cliente")
+            st.caption("Parcelas com data até a posição são tratadas como pagas: a planilha não registra "
+                       "recebimentos, então atrasos não aparecem no saldo")
+            if not limites_configurados:
+                st.caption("⚠️ Limites por Credit Score ilustrativos (valores de exemplo): defina os limites reais "
+                           "em VENDAS_CAFE_LIMITES_CREDITO")
+            data_posicao = st.date_input("Posição em", value=pd.Timestamp.today().date(), format="DD/MM/YYYY",
+                                         help="Parcelas com data posterior à posição entram no saldo a receber")
+
+            indice_recebiveis = receivables.build_index(chave_filtros, df_cashflow_detailed)
+            exposicao = receivables.credit_exposure(indice_recebiveis, data_posicao,
+                                                    receivables.latest_scores(client_info), limites_credito)
+
+            if exposicao.empty:
+                st.info("📝 Nenhuma parcela a receber após a data selecionada")
+            else:
+                acima_limite = exposicao['Situação'] == 'Acima do limite'
+                cols = st.columns(3)
+                with cols[0]:
+                    st.metric("Saldo a Receber", f"R$ {exposicao['Saldo a Receber'].sum():,.0f}")
+                with cols[1]:
+                    st.metric("Clientes com Saldo", f"{len(exposicao):,}")
+                with cols[2]:
+                    st.metric("Acima do Limite", f"{int(acima_limite.sum()):,}")
+
+                if acima_limite.any():
+                    st.warning("⚠️ Exposição acima do limite do Credit Score: " +
+                               ", ".join(exposicao.index[acima_limite]))
+
+                formato_recebiveis = {col: 'R$ {:,.0f}' for col in ['Saldo a Receber', 'Limite'] +
+                                      receivables.ROTULOS_FAIXAS}
+                formato_recebiveis['Uso do Limite (%)'] = '{:.1f}%'
+                st.dataframe(
+                    exposicao.style.format(formato_recebiveis, na_rep='-').apply(
+                        lambda x: ['background-color: #f8d7da' if x['Situação'] == 'Acima do limite' else ''
+                                   for _ in x],
+                        axis=1
+                    ),
+                    use_container_width=True
+                )
+
         else:
             st.warning(
                 "Não há dados de fluxo de caixa disponíveis para os filtros selecionados.")
 
+with tab8:
+    st.markdown("### Risco (Monte Carlo)")
+
+    # Simulação cacheada pelo snapshot filtrado (que inclui a cotação e a versão da planilha) e pelos parâmetros
+    @cache.memoize
+    def simulate_risk(chave_snapshot, mes_inicial, horizonte, n_cenarios, semente,
+                      _vendas_usd, _hedge_fixo, _hedge_exposto, _parametros):
+        return risk.run_simulation(_vendas_usd, _hedge_fixo, _hedge_exposto, cotacao_dolar, _parametros,
+                                   n_cenarios=n_cenarios, semente=semente)
+
+    modo_risco = st.toggle("Ativar simulação de risco", value=False,
+                           help="Simula cenários correlacionados de dólar e KC=F sobre as vendas em U$ "
+                                "sem PTAX fixada e os contratos de hedge em aberto")
+
+    if modo_risco:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            n_cenarios = st.select_slider("Cenários", options=[1000, 2000, 5000, 10000, 20000], value=10000)
+        with col2:
+            horizonte = st.slider("Horizonte (meses)", min_value=6, max_value=36, value=24)
+        with col3:
+            nivel = st.select_slider("Confiança", options=[0.90, 0.95, 0.99], value=0.95,
+                                     format_func=lambda x: f"{x:.0%}")
+
+        hoje = pd.Timestamp.today()
+        mes_inicial = hoje.year * 12 + hoje.month - 1
+
+        vendas_usd = risk.build_sales_exposure(df_filtered, mes_inicial, horizonte)
+        hedge_fixo, hedge_exposto = risk.build_hedge_exposure(load_hedge_data(versao_planilha), mes_inicial,
+                                                              horizonte)
+
+        if not (vendas_usd.any() or hedge_exposto.any()):
+            st.warning("Não há vendas em U$ sem PTAX fixada nem contratos de hedge em aberto no horizonte selecionado.")
+        else:
+            parametros = risk.estimate_parameters(load_historical_data(versao_planilha))
+            with st.spinner("Simulando cenários..."):
+                cenarios = simulate_risk(chave_filtros, mes_inicial, horizonte, n_cenarios, 42,
+                                         vendas_usd, hedge_fixo, hedge_exposto, parametros)
+            resumo = risk.summarize_paths(cenarios, mes_inicial, nivel)
+
+            cols = st.columns(3)
+            with cols[0]:
+                st.metric("Valor Esperado no Horizonte", f"R$ {resumo['Esperado'].sum():,.0f}")
+            with cols[1]:
+                total = cenarios.sum(axis=1)
+                var_total = total.mean() - pd.Series(total).quantile(1 - nivel)
+                st.metric(f"VaR {nivel:.0%} no Horizonte", f"R$ {var_total:,.0f}")
+            with cols[2]:
+                st.metric("Vol. Mensal (Dólar / KC=F)",
+                          f"{parametros['vol_fx']:.1%} / {parametros['vol_kc']:.1%}")
+
+            fig_risco = go.Figure()
+            fig_risco.add_trace(go.Scatter(x=resumo['Ano-Mês'], y=resumo['Superior'], mode='lines',
+                                           line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            fig_risco.add_trace(go.Scatter(x=resumo['Ano-Mês'], y=resumo['Inferior'], mode='lines',
+                                           line=dict(width=0), fill='tonexty',
+                                           fillcolor='rgba(0, 123, 255, 0.3)',
+                                           name=f"Banda {nivel:.0%}"))
+            fig_risco.add_trace(go.Scatter(x=resumo['Ano-Mês'], y=resumo['Mediana'], mode='lines+markers',
+                                           line=dict(color='blue', width=2), name='Mediana'))
+            fig_risco.update_layout(
+                title='Fluxo de Caixa Simulado por Mês (R$)',
+                xaxis=dict(tickangle=45),
+                yaxis=dict(title='Valor (R$)'),
+                height=500,
+                hovermode='x unified'
+            )
+            st.plotly_chart(fig_risco, use_container_width=True)
+
+            st.dataframe(
+                resumo.set_index('Ano-Mês').drop(columns='Data').style.format("R$ {:,.0f}"),
+                use_container_width=True
+            )
+
 if st.sidebar.checkbox("📋 Exibir tabela de dados"):
-    st.dataframe(df_filtered)
\ No newline at end of file
+    st.dataframe(df_filtered)
+
+if st.sidebar.checkbox("🧠 Exibir uso de memória"):
+    # Cada partição carregada e cada aba auxiliar corresponde a uma entrada de cache
+    frames = {f"Vendas safra {safra} (R$ {cotacao_dolar:.2f})": parte
+              for safra, parte in load_partitions(safras, cotacao_dolar, versao_planilha).items()}
+    frames['Hedge'] = load_hedge_data(versao_planilha)
+    frames['Futuros'] = load_futures_data(versao_planilha)
+    frames['Vendas filtradas'] = df_filtered
+
+    relatorio_memoria = schema.memory_report(frames)
+    resumo_memoria = schema.memory_summary(relatorio_memoria)
+
+    st.markdown("### Uso de Memória")
+    st.metric("Total dos DataFrames", f"{resumo_memoria['Bytes'].sum() / 1024:,.1f} KB")
+    st.dataframe(resumo_memoria.style.format({'Bytes': '{:,.0f}'}), use_container_width=True, hide_index=True)
+
+    # Snapshot Arrow mapeado: colunas sem nulos apontam para o arquivo, compartilhado entre os processos do servidor
+    instantaneo = open_snapshot(versao_planilha)
+    if instantaneo is not None:
+        st.caption(f"📦 Snapshot compartilhado {instantaneo.id}: {len(instantaneo.meta['tabelas'])} tabelas, "
+                   f"{instantaneo.mapped_bytes() / 1024:,.1f} KB mapeados")
+    else:
+        st.caption("📦 Sem snapshot compartilhado: dados lidos da planilha neste processo")
+
+    # Contadores do cache do processo (compartilhado entre todas as sessões)
+    stats_cache = cache.CACHE.stats()
+    cols = st.columns(4)
+    with cols[0]:
+        st.metric("Cache Ocupado", f"{stats_cache['bytes_ocupados'] / 2 ** 20:,.1f} / "
+                                   f"{stats_cache['orcamento_bytes'] / 2 ** 20:,.0f} MB")
+    with cols[1]:
+        st.metric("Acertos", f"{stats_cache['acertos']:,}")
+    with cols[2]:
+        st.metric("Faltas", f"{stats_cache['faltas']:,}")
+    with cols[3]:
+        st.metric("Despejos", f"{stats_cache['despejos']:,}")
+
+    # Single-flight: chamadas que esperaram o cálculo de outra sessão em vez de repetir o mesmo trabalho
+    cols = st.columns(3)
+    with cols[0]:
+        st.metric("Deduplicados", f"{stats_cache['deduplicados']:,}")
+    with cols[1]:
+        espera_media = stats_cache['espera_total_s'] / stats_cache['deduplicados'] if stats_cache['deduplicados'] else 0
+        st.metric("Espera Média / Máx.", f"{espera_media * 1000:,.0f} / {stats_cache['espera_max_s'] * 1000:,.0f} ms")
+    with cols[2]:
+        st.metric("Cálculos em Andamento", f"{stats_cache['em_andamento']:,}")
+
+    with st.expander(f"Entradas do cache ({stats_cache['entradas']})"):
+        entradas_cache = pd.DataFrame(
+            [(str(chave[0]).split('.')[-1], str(chave[1:]), tamanho) for chave, tamanho, _ in cache.CACHE.entries()],
+            columns=['Função', 'Chave', 'Bytes'])
+        st.dataframe(entradas_cache.iloc[::-1].style.format({'Bytes': '{:,.0f}'}),
+                     use_container_width=True, hide_index=True)
+    with st.expander("Bytes por coluna"):
+        st.dataframe(relatorio_memoria.style.format({'Bytes': '{:,.0f}'}), use_container_width=True, hide_index=True)
\ No newline at end of file
@@ -0,0 +1,184 @@
+# Latência de rerun do app.py (p50/p95) e memória por interação (heap Python e RSS do processo), com o AppTest do
+# Streamlit.
+#
+# Uso:
+#   python benchmarks/rerun_latency.py --tamanhos 1000,10000 --repeticoes 10 --saida bench.json
+#   python benchmarks/rerun_latency.py --limite-p95-ms 1500   # falha (código 1) se alguma interação passar do limite
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS
+    resource = None
+
+import numpy as np
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+PASTA_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PASTA_RAIZ)
+
+import cache  # noqa: E402
+from synthetic_workbook import write_workbook  # noqa: E402
+
+APP = os.path.join(PASTA_RAIZ, "app.py")
+
+
+def find_widget(at, tipo, label=None, key=None):
+    for widget in getattr(at, tipo):
+        if (label is not None and widget.label == label) or (key is not None and widget.key == key):
+            return widget
+    raise LookupError(f"Widget não encontrado: {tipo} {label or key}")
+
+
+# Cada interação altera um widget e devolve o AppTest pronto para o rerun; i é o número da repetição
+def change_dollar(at, i):
+    # Cotações sempre novas: mede o caminho sem cache, como quando o usuário digita um valor
+    return find_widget(at, 'number_input', label="💱 Cotação do Dólar (R$)").set_value(round(5.0 + 0.05 * (i + 1), 2))
+
+
+def toggle_stock(at, i):
+    checkbox = find_widget(at, 'checkbox', label="📈 Incluir Estoque")
+    return checkbox.set_value(not checkbox.value)
+
+
+def change_safras(at, i):
+    multiselect = find_widget(at, 'multiselect', label="Safras")
+    return multiselect.set_value(multiselect.options[-2:] if i % 2 == 0 else [multiselect.options[-2]])
+
+
+# Período completo do slider de fluxo de caixa, guardado no primeiro uso de cada AppTest
+_PERIODO_COMPLETO = {}
+
+
+def move_cashflow_slider(at, i):
+    slider = find_widget(at, 'slider', label="Selecione o período para visualização do fluxo de caixa")
+    inicio, fim = _PERIODO_COMPLETO.setdefault(id(at), slider.value)
+    if i % 2 == 0:
+        inicio = inicio + (fim - inicio) / 4
+    return slider.set_range(inicio, fim)
+
+
+def switch_hedge_status(at, i):
+    selectbox = find_widget(at, 'selectbox', key="hedge_status_simple")
+    return selectbox.set_value(selectbox.options[i % len(selectbox.options)])
+
+
+INTERACOES = {
+    'dolar': change_dollar,
+    'estoque': toggle_stock,
+    'safras': change_safras,
+    'slider_cashflow': move_cashflow_slider,
+    'status_hedge': switch_hedge_status,
+}
+
+
+def current_rss_mb():
+    # RSS atual do processo (Linux): inclui arrays NumPy/Arrow, páginas mapeadas já lidas e a memória nativa,
+    # que o tracemalloc não enxerga
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20, 2)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    # Pico de RSS do processo desde o início do benchmark (ru_maxrss: KB no Linux, bytes no macOS)
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 2)
+
+
+def timed_run(at):
+    inicio = time.perf_counter()
+    at.run()
+    duracao = (time.perf_counter() - inicio) * 1000
+    if at.exception:
+        raise RuntimeError(f"Erro no app: {at.exception[0].value}")
+    return duracao
+
+
+def measure_interaction(at, interacao, repeticoes):
+    latencias = []
+    for i in range(repeticoes):
+        interacao(at, i)
+        latencias.append(timed_run(at))
+
+    # Pico do heap Python medido em uma repetição extra, para o tracemalloc não distorcer as latências. O tracemalloc
+    # só vê alocações do Python; o RSS cobre também os buffers NumPy/Arrow e a memória nativa
+    tracemalloc.start()
+    interacao(at, repeticoes)
+    timed_run(at)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(float(np.percentile(latencias, 50)), 1),
+        'p95_ms': round(float(np.percentile(latencias, 95)), 1),
+        'pico_heap_python_mb': round(pico / 2 ** 20, 2),
+        'rss_mb': current_rss_mb(),
+        'pico_rss_processo_mb': peak_rss_mb(),
+        'repeticoes': repeticoes,
+    }
+
+
+def benchmark_size(n_linhas, repeticoes, pasta):
+    arquivo = write_workbook(os.path.join(pasta, f"vendas_{n_linhas}.xlsx"), n_linhas)
+    os.environ["VENDAS_CAFE_ARQUIVO"] = arquivo
+    os.environ["VENDAS_CAFE_PARTICOES"] = os.path.join(pasta, f"particoes_{n_linhas}")
+    os.environ["VENDAS_CAFE_SNAPSHOTS"] = os.path.join(pasta, f"snapshots_{n_linhas}")
+
+    # Cada tamanho começa com o cache vazio (primeiro acesso após o deploy)
+    cache.CACHE.clear()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    at = AppTest.from_file(APP, default_timeout=600)
+    carga_inicial = timed_run(at)
+
+    return {
+        'linhas': n_linhas,
+        'carga_inicial_ms': round(carga_inicial, 1),
+        'interacoes': {nome: measure_interaction(at, interacao, repeticoes) for nome, interacao in INTERACOES.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latência de rerun do dashboard")
+    parser.add_argument("--tamanhos", default="1000,10000", help="Linhas da Sheet2 sintética, separadas por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--limite-p95-ms", type=float, help="Falha se o p95 de alguma interação passar deste valor")
+    args = parser.parse_args()
+
+    # Mesmo diretório de trabalho do `streamlit run app.py`
+    os.chdir(PASTA_RAIZ)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados = [benchmark_size(int(n), args.repeticoes, pasta) for n in args.tamanhos.split(",")]
+
+    relatorio = json.dumps({'app': APP, 'resultados': resultados}, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(relatorio)
+    else:
+        print(relatorio)
+
+    if args.limite_p95_ms is not None:
+        estouros = [(r['linhas'], nome) for r in resultados for nome, m in r['interacoes'].items()
+                    if m['p95_ms'] > args.limite_p95_ms]
+        if estouros:
+            print(f"p95 acima de {args.limite_p95_ms} ms: {estouros}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
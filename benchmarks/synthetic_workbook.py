@@ -0,0 +1,96 @@
+# Gera planilhas sintéticas com o mesmo layout de vendas_cafe_em_reais.xlsx para os benchmarks
+import numpy as np
+import pandas as pd
+
+CLIENTES_EXPORTACAO = ['AW Trading - Unroasted', 'Southland', 'Emporia GMBH', 'Wells Coffee', 'Itah']
+CLIENTES_INTERNO = ['55 Coffee', 'Mundo Café', 'Los Baristas', 'Café 3 Corações', 'Naves Comércio de Café',
+                    'Londe e Ribeiro', 'Estoque']
+PENEIRAS = ['16/18', '17/18', '14/16', 'Moka', 'Vários']
+QUALIDADES = ['Petrus', 'Vários', 'Bebida Dura', 'Especial 82+', 'Rio']
+SAFRAS = [2021, 2022, 2023, 2024, 2025, 2026]
+
+
+def build_sales(n_linhas, rng):
+    exportacao = rng.random(n_linhas) < 0.6
+    safra = rng.choice(SAFRAS, n_linhas)
+    sacas = rng.choice([0.5, 10.0, 50.0, 280.0, 320.0, 640.0], n_linhas)
+    data_bl = pd.to_datetime([f"{s}-06-01" for s in safra]) + pd.to_timedelta(rng.integers(0, 365, n_linhas), 'D')
+    data_pagamento = data_bl + pd.to_timedelta(rng.integers(0, 120, n_linhas), 'D')
+
+    preco_usd = np.where(exportacao, rng.uniform(250, 600, n_linhas), np.nan)
+    # Metade das vendas de exportação com PTAX fixada; as demais dependem da curva/cotação da sidebar
+    ptax = np.where(exportacao & (rng.random(n_linhas) < 0.5), rng.uniform(4.8, 6.2, n_linhas), np.nan)
+    preco_rs = np.where(exportacao, preco_usd * ptax, rng.uniform(1300, 3200, n_linhas))
+
+    return pd.DataFrame({
+        'Safra': safra,
+        'Código': [f"{i % 1000:03d}/{s % 100}" for i, s in enumerate(safra)],
+        'Mercado': np.where(exportacao, 'Exportação', 'Mercado Interno'),
+        'Cliente': np.where(exportacao, rng.choice(CLIENTES_EXPORTACAO, n_linhas),
+                            rng.choice(CLIENTES_INTERNO, n_linhas)),
+        '# Sacas': sacas,
+        'Peneira': rng.choice(PENEIRAS, n_linhas),
+        'Qualidade': rng.choice(QUALIDADES, n_linhas),
+        'Diferencial': rng.choice([0.0, 13.7, 20.0, 30.0], n_linhas),
+        'Data BL': data_bl,
+        'Parcelas': rng.choice([1, 1, 1, 2, 4, 6], n_linhas),
+        'Data Pagamento': data_pagamento,
+        'Preço (cts/lb) *': np.where(exportacao, preco_usd / 1.3228, np.nan),
+        'Preço (u$/sc)': preco_usd,
+        'Receita U$': preco_usd * sacas,
+        'PTAX': ptax,
+        'Preço (R$/sc)': preco_rs,
+        'Receita R$': preco_rs * sacas,
+    })
+
+
+def build_hedge(n_contratos, rng):
+    status = rng.choice(['Liquidado', 'Financeiro', 'Físico'], n_contratos, p=[0.6, 0.35, 0.05])
+    vencimento = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 1200, n_contratos), 'D')
+    contratos = rng.integers(1, 30, n_contratos).astype(float)
+    preco = rng.uniform(180, 420, n_contratos)
+    liquidacao = rng.uniform(180, 420, n_contratos)
+    sacas = contratos * 283.5
+    resultado_usd = (preco - liquidacao) * sacas * 1.3228
+
+    liquidado = status == 'Liquidado'
+    return pd.DataFrame({
+        'Cliente': rng.choice(['Rabobank', 'Itaú BBA'], n_contratos),
+        'Status': status,
+        'Código': [str(28000000 + i) for i in range(n_contratos)],
+        '# Sacas': sacas,
+        'Contrato Referência': '-',
+        'Contratos': contratos,
+        'Preço (cts/lb)': preco,
+        'Liq. (cts/lb)': liquidacao,
+        'Trava Dólar': np.nan,
+        'Vencimento': vencimento,
+        'Data Liq.': vencimento.where(liquidado),
+        'Resultado U$': resultado_usd,
+        'Liq. (ptax)': np.where(liquidado, 5.5, np.nan),
+        'Resultado R$': np.where(liquidado, resultado_usd * 5.5, np.nan),
+    })
+
+
+def build_futures():
+    datas = pd.date_range('2025-12-31', periods=12, freq='QE')
+    precos = np.linspace(350, 290, len(datas))
+    # A quarta coluna (D) tem como nome a data da última atualização, como na planilha real
+    return pd.DataFrame({'Data': datas, 'KC=F': precos, 'Saca (U$)': precos * 1.3228, '26/12/25': np.nan})
+
+
+def build_history(rng):
+    datas = pd.date_range('2021-01-31', '2025-04-30', freq='ME')
+    brl = 5.3 * np.exp(np.cumsum(rng.normal(0, 0.03, len(datas))))
+    kc = 220 * np.exp(np.cumsum(rng.normal(0, 0.08, len(datas))))
+    return pd.DataFrame({'Data': datas, 'BRL=X': brl, 'KC=F': kc, 'Saca (R$)': kc * 1.3228 * brl})
+
+
+def write_workbook(caminho, n_linhas, semente=0):
+    rng = np.random.default_rng(semente)
+    with pd.ExcelWriter(caminho) as writer:
+        build_sales(n_linhas, rng).to_excel(writer, sheet_name='Sheet2', index=False)
+        build_hedge(max(30, n_linhas // 20), rng).to_excel(writer, sheet_name='hedge', index=False)
+        build_futures().to_excel(writer, sheet_name='futuros', index=False)
+        build_history(rng).to_excel(writer, sheet_name='medias_historicas', index=False)
+    return caminho
@@ -0,0 +1,163 @@
+# Cache em memória do processo, com orçamento global de bytes, despejo LRU e contadores
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Orçamento padrão do cache (MB), ajustável por variável de ambiente
+ORCAMENTO_PADRAO_MB = 256
+
+
+def estimate_size(valor):
+    # Bytes ocupados por um valor do cache (DataFrames com o conteúdo das strings)
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True, index=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True, index=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, (tuple, list)):
+        return sys.getsizeof(valor) + sum(estimate_size(v) for v in valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(estimate_size(k) + estimate_size(v) for k, v in valor.items())
+    return sys.getsizeof(valor)
+
+
+class _Calculo:
+    # Cálculo em andamento de uma chave: quem chega depois espera o resultado de quem começou
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.valor = None
+        self.erro = None
+
+
+class BudgetedCache:
+    # As entradas são compartilhadas entre sessões: quem lê do cache não deve alterar o objeto devolvido
+
+    def __init__(self, orcamento_bytes):
+        self.orcamento_bytes = orcamento_bytes
+        self._entradas = OrderedDict()
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.despejos = 0
+        self.bytes_ocupados = 0
+        self.deduplicados = 0
+        self.espera_total_s = 0.0
+        self.espera_max_s = 0.0
+
+    def get(self, chave):
+        with self._lock:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return True, self._entradas[chave][0]
+            self.faltas += 1
+            return False, None
+
+    def put(self, chave, valor):
+        tamanho = estimate_size(valor)
+        with self._lock:
+            if chave in self._entradas:
+                self.bytes_ocupados -= self._entradas.pop(chave)[1]
+            self._entradas[chave] = (valor, tamanho, time.time())
+            self.bytes_ocupados += tamanho
+
+            # Despeja as entradas usadas há mais tempo até caber no orçamento
+            while self.bytes_ocupados > self.orcamento_bytes and self._entradas:
+                _, (_, tamanho_despejado, _) = self._entradas.popitem(last=False)
+                self.bytes_ocupados -= tamanho_despejado
+                self.despejos += 1
+        return valor
+
+    def get_or_compute(self, chave, calcular):
+        # Single-flight: sessões que pedem a mesma chave ao mesmo tempo esperam um único cálculo
+        with self._lock:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave][0]
+
+            calculo = self._em_andamento.get(chave)
+            if calculo is None:
+                calculo = self._em_andamento[chave] = _Calculo()
+                self.faltas += 1
+                responsavel = True
+            else:
+                self.deduplicados += 1
+                responsavel = False
+
+        if not responsavel:
+            inicio = time.perf_counter()
+            calculo.pronto.wait()
+            espera = time.perf_counter() - inicio
+            with self._lock:
+                self.espera_total_s += espera
+                self.espera_max_s = max(self.espera_max_s, espera)
+            if calculo.erro is not None:
+                raise calculo.erro
+            return calculo.valor
+
+        try:
+            calculo.valor = self.put(chave, calcular())
+            return calculo.valor
+        except BaseException as e:
+            # Quem espera recebe o mesmo erro; a próxima chamada tenta calcular de novo
+            calculo.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            calculo.pronto.set()
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes_ocupados = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes_ocupados': self.bytes_ocupados,
+                'orcamento_bytes': self.orcamento_bytes,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'despejos': self.despejos,
+                'em_andamento': len(self._em_andamento),
+                'deduplicados': self.deduplicados,
+                'espera_total_s': self.espera_total_s,
+                'espera_max_s': self.espera_max_s,
+            }
+
+    def entries(self):
+        # Entradas da menos para a mais recentemente usada: (chave, bytes, criada em)
+        with self._lock:
+            return [(chave, tamanho, criada) for chave, (_, tamanho, criada) in self._entradas.items()]
+
+
+CACHE = BudgetedCache(int(float(os.environ.get("VENDAS_CAFE_CACHE_MB", ORCAMENTO_PADRAO_MB)) * 2 ** 20))
+
+
+def memoize(func):
+    # Como no st.cache_data, parâmetros com prefixo '_' ficam fora da chave: passe nos demais
+    # identificadores baratos do snapshot (versão da planilha, hash da partição, filtros) em vez dos DataFrames
+    assinatura = inspect.signature(func)
+    nome = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        argumentos = assinatura.bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        chave = (nome,) + tuple((k, v) for k, v in argumentos.arguments.items() if not k.startswith('_'))
+        return CACHE.get_or_compute(chave, lambda: func(*args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,326 @@
+# Carga dos dados da planilha (vendas particionadas por safra, hedge, futuros e históricos) e filtros,
+# compartilhada pelo dashboard (app.py) e pela API local (api.py)
+import functools
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import cache
+import schema
+import snapshot
+import storage
+
+ARQUIVO_PADRAO = "vendas_cafe_em_reais.xlsx"
+
+# Safras selecionadas por padrão no dashboard e na API
+SAFRAS_PADRAO = [2025]
+
+
+# Planilha de origem e pastas das partições e dos snapshots, trocáveis por variáveis de ambiente (ex.: benchmarks).
+# Lidas a cada chamada, como quando ficavam no topo do app.py, reexecutado a cada rerun
+def workbook_path():
+    return os.environ.get("VENDAS_CAFE_ARQUIVO", ARQUIVO_PADRAO)
+
+
+def partitions_folder():
+    return os.environ.get("VENDAS_CAFE_PARTICOES", storage.PASTA_PARTICOES)
+
+
+def snapshots_folder():
+    return os.environ.get("VENDAS_CAFE_SNAPSHOTS", snapshot.PASTA_SNAPSHOTS)
+
+
+# Versão da planilha (curva de PTAX, partições por safra e abas auxiliares): muda sempre que o arquivo é salvo.
+# É a chave barata dos caches: nenhum DataFrame é hasheado a cada rerun
+def get_workbook_version():
+    try:
+        return os.path.getmtime(workbook_path())
+    except OSError:
+        # Processo sem acesso à planilha: segue o último snapshot publicado e troca de versão junto com o ponteiro
+        return snapshot.published_version(snapshots_folder())
+
+
+# Função para buscar a data da última atualização
+@cache.memoize
+def get_last_update_date(versao):
+    instantaneo = open_snapshot(versao)
+    if instantaneo is not None and 'ultima_atualizacao' in instantaneo.meta:
+        return instantaneo.meta['ultima_atualizacao']
+    return read_last_update()
+
+
+def read_last_update():
+    try:
+        df_futuros = pd.read_excel(workbook_path(), sheet_name="futuros")
+        # Pegar o nome da coluna D (que é onde está a data)
+        last_update = df_futuros.columns[3]  # Nome da coluna D
+
+        # Tentar converter para datetime
+        try:
+            last_update = pd.to_datetime(last_update, format='%d/%m/%y')
+            return last_update.strftime("%d/%m/%Y")
+        except:
+            return str(last_update)
+    except Exception as e:
+        return "Data não disponível"
+
+@cache.memoize
+def load_ptax_curve(versao):
+    instantaneo = open_snapshot(versao)
+    if instantaneo is not None and instantaneo.has('ptax'):
+        return instantaneo.frame('ptax')
+    return read_ptax_curve()
+
+
+# A curva é guardada por versão, mas as safras preparadas com ela usam o hash do conteúdo: salvar a planilha sem
+# mexer na PTAX não invalida as safras
+@cache.memoize
+def ptax_curve_hash(versao):
+    return storage.content_hash(load_ptax_curve(versao))
+
+
+def read_ptax_curve():
+    # Aba 'ptax' (Data, PTAX) com a PTAX diária; datas futuras na aba são tratadas como cotações a termo.
+    # Sem essa aba, usa as médias mensais de BRL=X da aba 'medias_historicas'.
+    # 'Data' é o início da vigência de cada cotação e 'Fim' o último dia coberto por ela
+    for sheet_name, coluna, mensal in [("ptax", "PTAX", False), ("medias_historicas", "BRL=X", True)]:
+        try:
+            curva = pd.read_excel(workbook_path(), sheet_name=sheet_name, usecols=["Data", coluna])
+        except Exception:
+            continue
+
+        curva = curva.rename(columns={coluna: 'PTAX Curva'})
+        curva['Data'] = pd.to_datetime(curva['Data'], errors='coerce')
+        curva['PTAX Curva'] = pd.to_numeric(curva['PTAX Curva'], errors='coerce')
+        curva = curva.dropna()
+        if mensal:
+            # Médias mensais datadas no fim do mês valem para o mês inteiro: um pagamento no meio do mês
+            # recebe a média do próprio mês, não a do mês anterior
+            curva['Data'] = curva['Data'].dt.to_period('M').dt.to_timestamp()
+            curva['Fim'] = curva['Data'] + pd.offsets.MonthEnd(0)
+        else:
+            curva['Fim'] = curva['Data']
+        curva = curva.sort_values('Data').drop_duplicates('Data', keep='last')
+        if not curva.empty:
+            return curva.reset_index(drop=True)
+
+    return pd.DataFrame(columns=['Data', 'PTAX Curva', 'Fim'])
+
+
+def apply_ptax_curve(df, curva, dolar_value):
+    # Linhas sem PTAX recebem a cotação vigente na Data Pagamento (as-of), em um único merge ordenado
+    sem_ptax = df['PTAX'].isna() & df['Data Pagamento'].notna()
+
+    if sem_ptax.any() and not curva.empty:
+        datas = df.loc[sem_ptax, ['Data Pagamento']].sort_values('Data Pagamento').reset_index()
+        cotacoes = pd.merge_asof(datas, curva[['Data', 'PTAX Curva']], left_on='Data Pagamento', right_on='Data',
+                                 direction='backward').set_index('index')
+
+        # Datas além do fim da curva (sem cotação a termo) usam a cotação da sidebar
+        cotacoes.loc[cotacoes['Data Pagamento'] > curva['Fim'].iloc[-1], 'PTAX Curva'] = dolar_value
+        df.loc[cotacoes.index, 'PTAX'] = cotacoes['PTAX Curva']
+
+    df['PTAX'] = df['PTAX'].fillna(dolar_value)
+    return df
+
+
+@cache.memoize
+def load_manifest(versao):
+    # Manifesto publicado com o snapshot; sem snapshot, particiona a Sheet2 neste processo (ou, sem acesso à
+    # planilha, usa o último manifesto gravado)
+    instantaneo = open_snapshot(versao)
+    if instantaneo is not None and 'manifesto' in instantaneo.meta:
+        return instantaneo.meta['manifesto']
+    if versao is None or not os.path.exists(workbook_path()):
+        return storage.read_manifest(partitions_folder())
+    try:
+        return storage.sync_partitions(workbook_path(), pasta=partitions_folder())
+    except OSError:
+        return load_memory_partitions(versao)[0]
+
+
+# Sem permissão de escrita na pasta das partições: a Sheet2 é particionada só em memória, neste processo
+@cache.memoize
+def load_memory_partitions(versao):
+    colunas, partes = storage.read_workbook_partitions(workbook_path())
+    return {**storage.build_manifest(versao, colunas, partes), 'em_memoria': True}, partes
+
+
+def manifest_categories(manifesto):
+    # Categorias de cada dimensão com os valores de todas as safras
+    return {col: storage.manifest_values(manifesto, chave) for col, chave in storage.DIMENSOES.items()}
+
+
+def read_sheet(sheet_name, aplicar_schema=None):
+    try:
+        df = pd.read_excel(workbook_path(), sheet_name=sheet_name)
+    except Exception:
+        return None
+    return aplicar_schema(df) if aplicar_schema else df
+
+
+def prepare_partition(df, categorias):
+    # Preparação da safra que não depende da cotação do dólar
+    df["Peneira"] = df["Peneira"].astype(str)
+
+    # Converter 'Data Pagamento' para datetime
+    df['Data Pagamento'] = pd.to_datetime(df['Data Pagamento'], errors='coerce')
+
+    # Marcar as vendas que já têm PTAX fixada na planilha (as demais seguem expostas ao câmbio)
+    df['PTAX Fixada'] = df['PTAX'].notna()
+
+    # Tipos compactos: dimensões categóricas com as categorias de todas as safras (do manifesto)
+    return schema.apply_sales_schema(df, categorias)
+
+
+def read_prepared_partition(safra, categorias):
+    return prepare_partition(storage.read_partition(safra, partitions_folder()), categorias)
+
+
+def publish_snapshot(versao):
+    # Com a trava de publicação, um único processo particiona a Sheet2 e grava as vendas já preparadas, as abas
+    # auxiliares com o esquema compacto e a curva de PTAX em arquivos Arrow mapeados por todos os processos.
+    # Planilha ilegível (ex.: ainda sendo salva) ou falha de gravação: nada é publicado e o ponteiro não muda
+    def preparar():
+        manifesto = storage.sync_partitions(workbook_path(), pasta=partitions_folder())
+        categorias = manifest_categories(manifesto)
+        tabelas = {f"vendas_safra={safra}": functools.partial(read_prepared_partition, int(safra), categorias)
+                   for safra in manifesto['safras']}
+        tabelas.update({
+            'hedge': lambda: read_sheet("hedge", schema.apply_hedge_schema),
+            'futuros': lambda: read_sheet("futuros", schema.apply_futures_schema),
+            'historico': lambda: read_sheet("medias_historicas"),
+            'ptax': read_ptax_curve,
+        })
+        return tabelas, {'ultima_atualizacao': read_last_update(), 'manifesto': manifesto}
+
+    try:
+        snapshot.publish(snapshots_folder(), versao, preparar)
+        return True
+    except (OSError, ValueError, zipfile.BadZipFile, pa.ArrowException):
+        return False
+
+
+@cache.memoize
+def open_snapshot(versao):
+    # Snapshot da versão, com todas as tabelas mapeadas; publicado antes, se ainda não existir e a planilha estiver
+    # acessível neste processo. Se a publicação falhar (planilha salva pela metade), segue servindo o último
+    # snapshot publicado até a próxima versão
+    if versao is None:
+        return None
+    instantaneo = snapshot.open_snapshot(snapshots_folder(), versao)
+    if instantaneo is not None or not os.path.exists(workbook_path()):
+        return instantaneo
+    if not publish_snapshot(versao):
+        versao = snapshot.published_version(snapshots_folder())
+    return snapshot.open_snapshot(snapshots_folder(), versao) if versao is not None else None
+
+
+@cache.memoize
+def prepare_safra(safra, hash_particao, hash_categorias, _versao=None):
+    # Safra preparada uma vez por conteúdo: do snapshot sem cópia (somente leitura), senão da partição Parquet
+    instantaneo = open_snapshot(_versao)
+    if instantaneo is not None and instantaneo.has(f"vendas_safra={safra}"):
+        return instantaneo.frame(f"vendas_safra={safra}")
+    manifesto = load_manifest(_versao)
+    if manifesto.get('em_memoria'):
+        return prepare_partition(load_memory_partitions(_versao)[1][safra].copy(), manifest_categories(manifesto))
+    return read_prepared_partition(safra, manifest_categories(manifesto))
+
+
+@cache.memoize
+def load_safra(safra, hash_particao, dolar_value, hash_curva, hash_categorias, _versao=None):
+    # Cada safra é lida e preparada separadamente, com chave só no conteúdo (partição, curva de PTAX e categorias):
+    # salvar a planilha reprepara apenas a safra cuja partição mudou. _versao só indica de onde ler.
+    # Por cotação, só PTAX, Preço (R$/sc) e Receita R$ são novas; as demais colunas são as da safra preparada
+    # (cópia rasa, sem duplicar os dados entre cotações)
+    base = prepare_safra(safra, hash_particao, hash_categorias, _versao)
+
+    # PTAX histórica pela data de pagamento; cotação da sidebar para datas futuras
+    cambio = apply_ptax_curve(base[['PTAX', 'Data Pagamento']].copy(), load_ptax_curve(_versao), dolar_value)
+
+    # Recalcular os preços em reais com base na cotação do dólar onde estão ausentes
+    preco_rs = base['Preço (R$/sc)'].fillna(base['Preço (u$/sc)'] * cambio['PTAX'])
+
+    # Calculando a Receita R$ onde está ausente
+    receita_rs = base['Receita R$'].fillna(preco_rs * base['# Sacas'])
+
+    df = base.copy(deep=False)
+    df['PTAX'] = cambio['PTAX']
+    df['Preço (R$/sc)'] = preco_rs
+    df['Receita R$'] = receita_rs
+    return df
+
+
+def load_partitions(safras, dolar_value, versao):
+    # Carrega apenas as partições das safras selecionadas
+    manifesto = load_manifest(versao)
+    hash_curva, hash_categorias = ptax_curve_hash(versao), storage.categories_hash(manifesto)
+    return {safra: load_safra(safra, manifesto['safras'][str(safra)]['hash'], dolar_value, hash_curva,
+                              hash_categorias, versao)
+            for safra in safras if str(safra) in manifesto['safras']}
+
+
+def load_data(safras, dolar_value, versao):
+    partes = list(load_partitions(safras, dolar_value, versao).values())
+
+    if not partes:
+        return pd.DataFrame(columns=load_manifest(versao)['colunas'] + ['PTAX Fixada'])
+    return pd.concat(partes, ignore_index=True)
+
+# Abas auxiliares: do snapshot mapeado quando publicado (somente leitura), senão da planilha
+def load_shared_frame(versao, nome, sheet_name, aplicar_schema=None):
+    instantaneo = open_snapshot(versao)
+    if instantaneo is not None and instantaneo.has(nome):
+        return instantaneo.frame(nome)
+    df = read_sheet(sheet_name, aplicar_schema)
+    return df if df is not None else pd.DataFrame()
+
+
+@cache.memoize
+def load_hedge_data(versao):
+    return load_shared_frame(versao, 'hedge', "hedge", schema.apply_hedge_schema)
+
+@cache.memoize
+def load_futures_data(versao):
+    return load_shared_frame(versao, 'futuros', "futuros", schema.apply_futures_schema)
+
+@cache.memoize
+def load_historical_data(versao):
+    return load_shared_frame(versao, 'historico', "medias_historicas")
+
+
+def month_index(datas):
+    # Índice inteiro de mês (ano * 12 + mês) para montar a grade mensal
+    datas = pd.to_datetime(datas, errors='coerce')
+    return (datas.dt.year * 12 + datas.dt.month - 1).to_numpy(dtype='float64')
+
+
+def expand_installments(vendas):
+    # Cada venda expandida em suas parcelas mensais a partir da Data Pagamento, sem loop em Python: devolve, por
+    # parcela, a linha da venda de origem e o mês (month_index), e o número de parcelas de cada venda
+    parcelas = vendas['Parcelas'].where(vendas['Parcelas'] > 0, 1).fillna(1).to_numpy(dtype='int64')
+    linha = np.repeat(np.arange(len(vendas)), parcelas)
+    parcela = np.arange(len(linha)) - np.repeat(np.cumsum(parcelas) - parcelas, parcelas)
+    return linha, month_index(vendas['Data Pagamento'])[linha] + parcela, parcelas
+
+
+def filter_sales(df, safras, mercado, clientes, qualidades, peneiras=None, incluir_estimativas=True):
+    mask = (df['Safra'].isin(safras) &
+            df['Cliente'].isin(clientes) &
+            df['Qualidade'].astype(str).isin(qualidades) &
+            df['Mercado'].isin(mercado))
+    if peneiras is not None:
+        mask &= df['Peneira'].astype(str).isin(peneiras)
+    if not incluir_estimativas:
+        mask &= df['Cliente'] != "Estoque"
+    return df[mask]
+
+
+def snapshot_key(versao, dolar_value, safras, incluir_estimativas, mercado, clientes, qualidades):
+    # Identificador barato do snapshot filtrado, usado como chave de cache no lugar do próprio DataFrame
+    return (versao, dolar_value, tuple(safras), incluir_estimativas,
+            tuple(mercado), tuple(clientes), tuple(qualidades))
@@ -0,0 +1,195 @@
+# Modo ao vivo dos futuros: ticks de KC=F (cts/lb) de uma fonte local, buffer circular e revalorização
+# incremental dos contratos de hedge em aberto.
+#
+# Fontes, só as configuradas no servidor (VENDAS_CAFE_FEED, separadas por vírgula; a primeira é a padrão):
+#   arquivo:dados/ticks.csv     acompanha o arquivo como `tail -f`; uma linha por tick: "2025-12-26T10:15:00,352.40"
+#                               ou só "352.40" (hora da leitura)
+#   socket:127.0.0.1:9999       datagramas UDP locais no mesmo formato (ex.: echo 352.40 | nc -u -w0 127.0.0.1 9999)
+import os
+import socket
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from risk import FATOR_SACA
+
+# Lista fixa de fontes que a aba Hedge pode abrir: quem acessa o dashboard escolhe entre elas, sem informar
+# caminhos ou portas. VENDAS_CAFE_FEED vazia (ou só com vírgulas) usa a fonte embutida
+FONTE_EMBUTIDA = "arquivo:dados/ticks.csv"
+FONTES_PERMITIDAS = [uri.strip() for uri in os.environ.get("VENDAS_CAFE_FEED", "").split(',')
+                     if uri.strip()] or [FONTE_EMBUTIDA]
+FONTE_PADRAO = FONTES_PERMITIDAS[0]
+INTERVALO_PADRAO_S = float(os.environ.get("VENDAS_CAFE_FEED_INTERVALO", 2))
+# Ticks guardados no buffer circular (os mais antigos são descartados)
+CAPACIDADE_PADRAO = 2000
+
+
+def parse_tick(linha):
+    # "timestamp,preço" ou "preço"; linhas inválidas são ignoradas
+    partes = linha.strip().split(',')
+    try:
+        preco = float(partes[-1])
+        momento = datetime.fromisoformat(partes[0]) if len(partes) > 1 else datetime.now()
+    except ValueError:
+        return None
+    return momento, preco
+
+
+class FileTickSource:
+    # Lê apenas o que foi acrescentado desde a última leitura; linhas incompletas esperam o próximo poll
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._posicao = 0
+        self._resto = ''
+
+    def read(self):
+        if not os.path.exists(self.caminho):
+            return []
+        if os.path.getsize(self.caminho) < self._posicao:
+            # Arquivo truncado ou substituído: recomeça do início
+            self._posicao, self._resto = 0, ''
+
+        with open(self.caminho, encoding='utf-8') as f:
+            f.seek(self._posicao)
+            texto = self._resto + f.read()
+            self._posicao = f.tell()
+
+        *linhas, self._resto = texto.split('\n')
+        return [tick for tick in map(parse_tick, linhas) if tick is not None]
+
+    def close(self):
+        pass
+
+
+class SocketTickSource:
+    # Socket UDP não bloqueante: cada poll esvazia os datagramas pendentes
+
+    def __init__(self, host, porta):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, porta))
+        self._socket.setblocking(False)
+
+    def read(self):
+        ticks = []
+        while True:
+            try:
+                dados = self._socket.recv(65536)
+            except BlockingIOError:
+                return ticks
+            ticks.extend(tick for tick in map(parse_tick, dados.decode('utf-8').splitlines()) if tick is not None)
+
+    def close(self):
+        self._socket.close()
+
+
+FONTES = {
+    'arquivo': lambda endereco: FileTickSource(endereco),
+    'socket': lambda endereco: SocketTickSource(endereco.rsplit(':', 1)[0], int(endereco.rsplit(':', 1)[1])),
+}
+
+
+def open_source(uri):
+    tipo, _, endereco = uri.partition(':')
+    if tipo not in FONTES or not endereco:
+        raise ValueError(f"fonte inválida: {uri} (use {' ou '.join(f'{t}:<endereço>' for t in FONTES)})")
+    return FONTES[tipo](endereco)
+
+
+class LiveFeed:
+    # Compartilhado entre sessões (shared_feed): leituras e revalorizações passam pelo mesmo lock
+
+    def __init__(self, fonte, capacidade=CAPACIDADE_PADRAO):
+        self.fonte = fonte
+        self.fechado = False
+        self.ticks = deque(maxlen=capacidade)
+        # Resultado em U$ dos contratos em aberto em cada tick (multiplicado pelo dólar só na exibição)
+        self.resultados_usd = deque(maxlen=capacidade)
+        self.versao_contratos = None
+        self._lock = threading.Lock()
+        self._contratos = pd.DataFrame()
+        self._preco = np.zeros(0)
+        self._sacas = np.zeros(0)
+        self._soma_preco_sacas = 0.0
+        self._soma_sacas = 0.0
+
+    def set_contracts(self, df_hedge, versao):
+        # Contratos em aberto preparados uma vez por versão da planilha
+        with self._lock:
+            if versao == self.versao_contratos:
+                return
+            colunas = ['Status', 'Preço (cts/lb)', '# Sacas']
+            if df_hedge.empty or not all(col in df_hedge.columns for col in colunas):
+                abertos = pd.DataFrame(columns=colunas)
+            else:
+                abertos = df_hedge[df_hedge['Status'] != 'Liquidado'].dropna(subset=colunas[1:])
+
+            self._contratos = abertos.reset_index(drop=True)
+            self._preco = abertos['Preço (cts/lb)'].to_numpy(dtype='float64')
+            self._sacas = abertos['# Sacas'].to_numpy(dtype='float64') * FATOR_SACA
+            self._soma_preco_sacas = float(self._preco @ self._sacas)
+            self._soma_sacas = float(self._sacas.sum())
+            self.versao_contratos = versao
+            self.resultados_usd = deque((self._total_usd(preco) for _, preco in self.ticks),
+                                        maxlen=self.ticks.maxlen)
+
+    def _total_usd(self, preco):
+        # Σ (Preço_i - KC) × Sacas_i × 1,3228 a partir das somas pré-calculadas
+        return self._soma_preco_sacas - preco * self._soma_sacas
+
+    def poll(self):
+        # Consome os ticks novos da fonte; devolve quantos chegaram
+        with self._lock:
+            # Feed já fechado: sessões que ainda o têm param de receber ticks
+            if self.fechado:
+                return 0
+            novos = self.fonte.read()
+            for momento, preco in novos:
+                self.ticks.append((momento, preco))
+                self.resultados_usd.append(self._total_usd(preco))
+            return len(novos)
+
+    def close(self):
+        with self._lock:
+            if not self.fechado:
+                self.fonte.close()
+                self.fechado = True
+
+    def last_price(self):
+        with self._lock:
+            return self.ticks[-1][1] if self.ticks else None
+
+    def history(self, cotacao_dolar):
+        with self._lock:
+            return pd.DataFrame({
+                'Data': [momento for momento, _ in self.ticks],
+                'KC=F': [preco for _, preco in self.ticks],
+                'Resultado R$': np.asarray(self.resultados_usd, dtype='float64') * cotacao_dolar,
+            })
+
+    def revalue(self, cotacao_dolar):
+        # Resultado por contrato em aberto no último tick, mesma fórmula do cálculo da planilha
+        with self._lock:
+            if not self.ticks:
+                return self._contratos.assign(**{'Resultado ao Vivo R$': np.nan})
+            preco = self.ticks[-1][1]
+            resultado = (self._preco - preco) * self._sacas * cotacao_dolar
+            return self._contratos.assign(**{'KC=F': preco, 'Resultado ao Vivo R$': resultado})
+
+
+# Um feed por fonte em cada processo, compartilhado entre as sessões que escolheram a mesma fonte: trocar de fonte
+# em uma sessão não afeta as outras. A lista de fontes é fixa, então há no máximo um feed (e um socket) por fonte
+_feeds = {}
+_feed_lock = threading.Lock()
+
+
+def shared_feed(uri):
+    if uri not in FONTES_PERMITIDAS:
+        raise ValueError(f"fonte não configurada: {uri} (defina em VENDAS_CAFE_FEED)")
+    with _feed_lock:
+        if uri not in _feeds:
+            _feeds[uri] = LiveFeed(open_source(uri))
+        return _feeds[uri]
@@ -0,0 +1,103 @@
+# Escada de cobertura: volume físico em U$ (Sheet2) por mês de pagamento x contratos de hedge em aberto por vencimento
+import pandas as pd
+
+import cache
+import storage
+from dataset import expand_installments, filter_sales, month_index
+
+# Contratos que ainda cobrem volume físico
+STATUS_ABERTOS = ['Financeiro', 'Físico']
+
+
+def month_to_date(meses):
+    meses = pd.Index(meses, dtype='int64')
+    return pd.to_datetime({'year': meses // 12, 'month': meses % 12 + 1, 'day': 1})
+
+
+def bucket_sales(df):
+    # Sacas e receita U$ das vendas em U$ somadas por mês de pagamento (eixo inteiro ano * 12 + mês); vendas
+    # parceladas são divididas igualmente entre os meses das parcelas, como no fluxo de caixa
+    vendas = df[df['Preço (u$/sc)'].notna() & df['Data Pagamento'].notna()]
+    linha, mes, parcelas = expand_installments(vendas)
+    sacas = vendas['# Sacas'].to_numpy(dtype='float64') / parcelas
+    receita = (vendas['Preço (u$/sc)'] * vendas['# Sacas']).to_numpy(dtype='float64') / parcelas
+    return pd.DataFrame({
+        'Mês': mes.astype('int64'),
+        'Sacas Físicas': sacas[linha],
+        'Receita U$': receita[linha],
+    }).groupby('Mês').sum()
+
+
+def bucket_hedge(df_hedge):
+    # Sacas dos contratos em aberto somadas por mês de vencimento
+    if df_hedge.empty or not {'Status', 'Vencimento', '# Sacas'} <= set(df_hedge.columns):
+        return pd.DataFrame({'Sacas Hedge': pd.Series(dtype='float64')}, index=pd.Index([], name='Mês', dtype='int64'))
+
+    abertos = df_hedge[df_hedge['Status'].isin(STATUS_ABERTOS)].dropna(subset=['Vencimento', '# Sacas'])
+    return pd.DataFrame({
+        'Mês': month_index(abertos['Vencimento']).astype('int64'),
+        'Sacas Hedge': abertos['# Sacas'].to_numpy(dtype='float64'),
+    }).groupby('Mês').sum()
+
+
+# Cada partição de vendas é agregada uma vez por hash e filtros (sem depender da cotação do dólar);
+# quando só uma safra muda, só ela é reagregada
+@cache.memoize
+def sales_buckets(safra, hash_particao, mercado, clientes, qualidades, incluir_estimativas, _df_safra):
+    return bucket_sales(filter_sales(_df_safra, [safra], mercado, clientes, qualidades,
+                                     incluir_estimativas=incluir_estimativas))
+
+
+# O hash do conteúdo da aba hedge é calculado uma vez por versão da planilha; as agregações são guardadas
+# por esse hash, então salvar a planilha sem mexer no hedge não reagrega os contratos
+@cache.memoize
+def hedge_content_hash(versao, _df_hedge):
+    return storage.content_hash(_df_hedge)
+
+
+@cache.memoize
+def hedge_buckets(hash_hedge, _df_hedge):
+    return bucket_hedge(_df_hedge)
+
+
+def build_ladder(fisico, hedge):
+    # Junção dos dois livros no mesmo eixo de meses, com cobertura e exposição descoberta por mês e acumuladas
+    ladder = fisico.join(hedge, how='outer').fillna(0.0).sort_index()
+    if ladder.empty:
+        return ladder
+
+    ladder['Cobertura (%)'] = (ladder['Sacas Hedge'] / ladder['Sacas Físicas'].where(ladder['Sacas Físicas'] > 0)
+                               * 100).round(1)
+    # Hedge de um mês só cobre o físico do próprio mês: meses sem venda (ou com hedge acima do físico) não
+    # compensam a falta de cobertura em outros meses
+    ladder['Sacas Cobertas'] = ladder[['Sacas Hedge', 'Sacas Físicas']].min(axis=1)
+    ladder['Sacas Descobertas'] = ladder['Sacas Físicas'] - ladder['Sacas Cobertas']
+    preco_medio_usd = ladder['Receita U$'] / ladder['Sacas Físicas'].where(ladder['Sacas Físicas'] > 0)
+    ladder['Exposição Descoberta U$'] = (ladder['Sacas Descobertas'] * preco_medio_usd).fillna(0.0)
+
+    ladder['Cobertura Acumulada (%)'] = (ladder['Sacas Cobertas'].cumsum() /
+                                         ladder['Sacas Físicas'].cumsum().where(lambda x: x > 0) * 100).round(1)
+
+    ladder.insert(0, 'Data', month_to_date(ladder.index).to_numpy())
+    ladder.insert(1, 'Ano-Mês', ladder['Data'].dt.strftime('%b/%y'))
+    return ladder.reset_index(drop=True)
+
+
+def total_coverage(ladder):
+    # Físico coberto mês a mês sobre o físico total (%): Σ min(hedge, físico) / Σ físico
+    total_fisico = ladder['Sacas Físicas'].sum()
+    return float(ladder['Sacas Cobertas'].sum() / total_fisico * 100) if total_fisico > 0 else 0.0
+
+
+@cache.memoize
+def coverage_ladder(versao, safras, mercado, clientes, qualidades, incluir_estimativas, _particoes, _manifesto,
+                    _df_hedge):
+    # Snapshot = versão da planilha + filtros (a escada não depende da cotação do dólar)
+    baldes = [sales_buckets(safra, _manifesto['safras'][str(safra)]['hash'], mercado, clientes, qualidades,
+                            incluir_estimativas, parte)
+              for safra, parte in _particoes.items()]
+    fisico = (pd.concat(baldes).groupby(level=0).sum() if baldes
+              else pd.DataFrame(columns=['Sacas Físicas', 'Receita U$'], dtype='float64',
+                                index=pd.Index([], name='Mês', dtype='int64')))
+
+    return build_ladder(fisico, hedge_buckets(hedge_content_hash(versao, _df_hedge), _df_hedge))
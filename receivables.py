@@ -0,0 +1,95 @@
+# Índice de recebíveis por cliente a partir do ledger de parcelas do fluxo de caixa: saldo a receber e faixas de
+# vencimento em qualquer data, com limite de exposição pelo Credit Score
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache
+
+# Faixas de vencimento (dias após a data de posição); a última vai até a parcela mais distante
+FAIXAS_DIAS = [0, 30, 60, 90, 180]
+ROTULOS_FAIXAS = ['A vencer 0-30d', 'A vencer 31-60d', 'A vencer 61-90d', 'A vencer 91-180d', 'A vencer >180d']
+
+# Estoque próprio ainda não vendido: entra no fluxo de caixa como estimativa, mas não é exposição a um cliente
+SEM_EXPOSICAO = ['Estoque']
+
+# Espaço de dias reservado para cada cliente na chave composta (cliente * ESPACO_DIAS + dia)
+ESPACO_DIAS = 1_000_000
+
+
+def load_credit_limits(padrao):
+    # Limites por Credit Score ({score: limite R$}) definidos no servidor em VENDAS_CAFE_LIMITES_CREDITO (JSON, ex.:
+    # '{"5": 5000000, "4": 3000000}'); sem configuração válida, usa os valores de exemplo. Devolve também se os
+    # limites vieram da configuração
+    try:
+        configurados = json.loads(os.environ.get("VENDAS_CAFE_LIMITES_CREDITO", ""))
+        limites = {int(score): float(limite) for score, limite in configurados.items()}
+    except (ValueError, TypeError, AttributeError):
+        return dict(padrao), False
+    return (limites, True) if limites else (dict(padrao), False)
+
+
+def latest_scores(client_info):
+    # Credit Score do ano mais recente de cada cliente
+    return {cliente: info['Financeiro'][max(info['Financeiro'])]['Credit Score']
+            for cliente, info in client_info.items() if info.get('Financeiro')}
+
+
+def day_number(datas):
+    # Dias desde 1970-01-01
+    return pd.to_datetime(datas).to_numpy(dtype='datetime64[D]').astype('int64')
+
+
+@cache.memoize
+def build_index(chave_snapshot, _ledger):
+    # Parcelas ordenadas por (cliente, data) com soma acumulada: a soma de qualquer intervalo de datas de um
+    # cliente é a diferença de dois pontos da soma acumulada, localizados por busca binária
+    ledger = _ledger.dropna(subset=['Data', 'Valor', 'Cliente']) if not _ledger.empty else _ledger
+    if ledger.empty:
+        return {'clientes': np.array([], dtype=object), 'chaves': np.zeros(0, dtype='int64'),
+                'acumulado': np.zeros(1), 'fim': np.zeros(0, dtype='int64')}
+
+    codigos, clientes = pd.factorize(ledger['Cliente'].astype(str), sort=True)
+    chaves = codigos.astype('int64') * ESPACO_DIAS + day_number(ledger['Data'])
+    ordem = np.argsort(chaves, kind='stable')
+
+    return {
+        'clientes': np.asarray(clientes, dtype=object),
+        'chaves': chaves[ordem],
+        'acumulado': np.concatenate([[0.0], np.cumsum(ledger['Valor'].to_numpy(dtype='float64')[ordem])]),
+        'fim': np.bincount(codigos, minlength=len(clientes)).cumsum(),
+    }
+
+
+def aging(indice, data_posicao):
+    # Saldo a receber (parcelas com data após a posição) e faixas de vencimento por cliente: O(clientes × faixas)
+    # buscas binárias, sem percorrer as parcelas
+    n_clientes = len(indice['clientes'])
+    base = np.arange(n_clientes, dtype='int64') * ESPACO_DIAS
+    dia = day_number([data_posicao])[0]
+
+    limites = [np.searchsorted(indice['chaves'], base + dia + dias, side='right') for dias in FAIXAS_DIAS]
+    limites.append(indice['fim'])
+    somas = [indice['acumulado'][posicao] for posicao in limites]
+
+    resultado = pd.DataFrame({rotulo: somas[i + 1] - somas[i] for i, rotulo in enumerate(ROTULOS_FAIXAS)},
+                             index=pd.Index(indice['clientes'], name='Cliente'))
+    resultado.insert(0, 'Saldo a Receber', somas[-1] - somas[0])
+    return resultado
+
+
+def credit_exposure(indice, data_posicao, scores, limites_por_score):
+    # Saldo e faixas por cliente com o limite do Credit Score ({score: limite R$}) e o sinal de excesso
+    exposicao = aging(indice, data_posicao).drop(index=SEM_EXPOSICAO, errors='ignore')
+    exposicao = exposicao[exposicao['Saldo a Receber'] > 0].copy()
+
+    score = pd.Series(exposicao.index.map(scores), index=exposicao.index, dtype='float64')
+    exposicao['Credit Score'] = score.astype('Int64')
+    exposicao['Limite'] = score.map(limites_por_score)
+    exposicao['Uso do Limite (%)'] = (exposicao['Saldo a Receber'] / exposicao['Limite'] * 100).round(1)
+    exposicao['Situação'] = np.select(
+        [exposicao['Limite'].isna(), exposicao['Saldo a Receber'] > exposicao['Limite']],
+        ['Sem score', 'Acima do limite'], default='Dentro do limite')
+    return exposicao.sort_values('Saldo a Receber', ascending=False)
@@ -0,0 +1,128 @@
+# Motor de Monte Carlo para o risco de câmbio (BRL=X) e café (KC=F) sobre o fluxo de caixa e o hedge
+import math
+
+import numpy as np
+import pandas as pd
+
+from dataset import expand_installments, month_index
+
+# Fator de conversão de cts/lb para U$/saca (mesmo usado em calculate_hedge_results)
+FATOR_SACA = 1.3228
+
+# Volatilidades mensais e correlação usadas quando não há histórico suficiente
+PARAMETROS_PADRAO = {'vol_fx': 0.04, 'vol_kc': 0.09, 'corr': -0.2}
+
+# Tamanho fixo dos lotes: limita a memória de cada lote (cenários x meses x 2) e garante o mesmo resultado para a
+# mesma semente, qualquer que seja o número de cenários pedido. A simulação roda no próprio processo: até o máximo
+# da interface (20k cenários) ela leva dezenas de ms, menos que iniciar e alimentar um pool de processos
+TAMANHO_LOTE = 2000
+
+
+def estimate_parameters(df_historico):
+    # Volatilidade e correlação mensais a partir dos retornos logarítmicos de BRL=X e KC=F
+    if df_historico is None or df_historico.empty or not {'BRL=X', 'KC=F'} <= set(df_historico.columns):
+        return dict(PARAMETROS_PADRAO)
+
+    precos = df_historico[['BRL=X', 'KC=F']].apply(pd.to_numeric, errors='coerce').dropna()
+    retornos = np.log(precos[precos > 0].dropna()).diff().dropna()
+    if len(retornos) < 6:
+        return dict(PARAMETROS_PADRAO)
+
+    return {
+        'vol_fx': float(retornos['BRL=X'].std()),
+        'vol_kc': float(retornos['KC=F'].std()),
+        'corr': float(retornos['BRL=X'].corr(retornos['KC=F'])),
+    }
+
+
+def build_sales_exposure(df, mes_inicial, horizonte):
+    # Receita em U$ ainda sem PTAX fixada, distribuída nas parcelas de cada mês da grade
+    if df.empty:
+        return np.zeros(horizonte)
+
+    mask = df['Preço (u$/sc)'].notna() & df['Data Pagamento'].notna()
+    if 'PTAX Fixada' in df.columns:
+        mask &= ~df['PTAX Fixada']
+    vendas = df[mask]
+    if vendas.empty:
+        return np.zeros(horizonte)
+
+    linha, mes, parcelas = expand_installments(vendas)
+    receita_usd = (vendas['Preço (u$/sc)'] * vendas['# Sacas']).to_numpy(dtype='float64') / parcelas
+    mes = mes - mes_inicial
+
+    dentro = (mes >= 0) & (mes < horizonte)
+    return np.bincount(mes[dentro].astype('int64'), weights=receita_usd[linha][dentro], minlength=horizonte)
+
+
+def build_hedge_exposure(df_hedge, mes_inicial, horizonte):
+    # Contratos em aberto agregados por mês de vencimento: parte fixa (preço) e parte exposta ao KC=F (liquidação)
+    colunas = ['Status', 'Vencimento', 'Preço (cts/lb)', 'Liq. (cts/lb)', '# Sacas']
+    if df_hedge.empty or not all(col in df_hedge.columns for col in colunas):
+        return np.zeros(horizonte), np.zeros(horizonte)
+
+    abertos = df_hedge[df_hedge['Status'] != 'Liquidado'].dropna(subset=colunas[1:])
+    if abertos.empty:
+        return np.zeros(horizonte), np.zeros(horizonte)
+
+    # Contratos vencidos e ainda não liquidados entram no primeiro mês da grade
+    mes = np.clip(month_index(abertos['Vencimento']) - mes_inicial, 0, None)
+    dentro = mes < horizonte
+    mes = mes[dentro].astype('int64')
+    sacas = abertos['# Sacas'].to_numpy(dtype='float64')[dentro] * FATOR_SACA
+
+    fixo = np.bincount(mes, weights=abertos['Preço (cts/lb)'].to_numpy(dtype='float64')[dentro] * sacas,
+                       minlength=horizonte)
+    exposto = np.bincount(mes, weights=abertos['Liq. (cts/lb)'].to_numpy(dtype='float64')[dentro] * sacas,
+                          minlength=horizonte)
+    return fixo, exposto
+
+
+def simulate_chunk(semente, n_cenarios, dolar_inicial, parametros, vendas_usd, hedge_fixo, hedge_exposto):
+    # Caminhos log-normais correlacionados (sem drift) para o dólar e para o fator multiplicativo do KC=F
+    horizonte = len(vendas_usd)
+    rng = np.random.default_rng(semente)
+
+    vol = np.array([parametros['vol_fx'], parametros['vol_kc']])
+    corr = np.clip(parametros['corr'], -0.999, 0.999)
+    cholesky = np.linalg.cholesky(np.array([[1.0, corr], [corr, 1.0]]))
+
+    choques = rng.standard_normal((n_cenarios, horizonte, 2)) @ cholesky.T
+    log_fatores = np.cumsum(choques * vol - 0.5 * vol ** 2, axis=1)
+
+    dolar = dolar_inicial * np.exp(log_fatores[:, :, 0])
+    fator_kc = np.exp(log_fatores[:, :, 1])
+
+    # Resultado do hedge = (Preço - Liq.) x Sacas x Dólar x 1.3228, com a liquidação deslocada pelo cenário de KC=F
+    return dolar * (vendas_usd + hedge_fixo - hedge_exposto * fator_kc)
+
+
+def run_simulation(vendas_usd, hedge_fixo, hedge_exposto, dolar_inicial, parametros, n_cenarios=10000, semente=42):
+    # Divide os cenários em lotes de tamanho fixo, cada um com sua própria semente derivada
+    n_lotes = max(1, math.ceil(n_cenarios / TAMANHO_LOTE))
+    sementes = np.random.SeedSequence(semente).spawn(n_lotes)
+    tamanhos = [min(TAMANHO_LOTE, n_cenarios - i * TAMANHO_LOTE) for i in range(n_lotes)]
+
+    return np.concatenate([simulate_chunk(s, n, dolar_inicial, parametros, vendas_usd, hedge_fixo, hedge_exposto)
+                           for s, n in zip(sementes, tamanhos)])
+
+
+def summarize_paths(cenarios, mes_inicial, nivel=0.95):
+    # Bandas de percentis e VaR por mês da grade
+    inferior = (1 - nivel) * 100
+    percentis = np.percentile(cenarios, [inferior, 50, 100 - inferior], axis=0)
+    esperado = cenarios.mean(axis=0)
+
+    meses = mes_inicial + np.arange(cenarios.shape[1])
+    datas = pd.to_datetime({'year': meses // 12, 'month': meses % 12 + 1, 'day': 1})
+
+    resumo = pd.DataFrame({
+        'Data': datas,
+        'Esperado': esperado,
+        'Inferior': percentis[0],
+        'Mediana': percentis[1],
+        'Superior': percentis[2],
+        'VaR': esperado - percentis[0],
+    })
+    resumo['Ano-Mês'] = resumo['Data'].dt.strftime('%b/%y')
+    return resumo
@@ -0,0 +1,82 @@
+# Esquema compacto de tipos aplicado na carga e relatório de memória dos DataFrames
+import numpy as np
+import pandas as pd
+
+# Dimensões de baixa cardinalidade que viram categóricas, com categorias estáveis entre cargas
+CATEGORICAS_VENDAS = ['Cliente', 'Mercado', 'Qualidade', 'Peneira']
+CATEGORICAS_HEDGE = ['Cliente', 'Status']
+
+# Status conhecidos do hedge vêm primeiro, na ordem usada nos filtros
+STATUS_HEDGE = ['Liquidado', 'Financeiro', 'Físico']
+
+# Colunas monetárias ficam em float64: somas de milhões de reais perderiam centavos em float32
+COLUNAS_FLOAT64 = ['Preço (u$/sc)', 'Receita U$', 'PTAX', 'Preço (R$/sc)', 'Receita R$', 'Resultado U$',
+                   'Resultado R$', 'Resultado Calculado R$']
+
+
+def stable_categories(valores, conhecidas=()):
+    # Categorias conhecidas na ordem dada, seguidas dos demais valores em ordem alfabética
+    extras = sorted({str(v) for v in valores if pd.notna(v)} - set(conhecidas))
+    return list(conhecidas) + extras
+
+
+def to_categorical(serie, categorias):
+    serie = serie.where(serie.isna(), serie.astype(str))
+    return pd.Categorical(serie, categories=categorias)
+
+
+def downcast_numeric(df, preservar=COLUNAS_FLOAT64):
+    # Inteiros para o menor tipo que comporta os valores; floats para float32 só quando a conversão é exata
+    for col in df.columns:
+        serie = df[col]
+        if col in preservar or pd.api.types.is_bool_dtype(serie):
+            continue
+        if pd.api.types.is_integer_dtype(serie):
+            df[col] = pd.to_numeric(serie, downcast='integer')
+        elif pd.api.types.is_float_dtype(serie):
+            compacta = serie.astype('float32')
+            if np.array_equal(compacta.astype('float64').to_numpy(), serie.to_numpy(), equal_nan=True):
+                df[col] = compacta
+    return df
+
+
+def apply_sales_schema(df, categorias):
+    # categorias: {coluna: lista de categorias} (vêm do manifesto, iguais para todas as safras)
+    for col in CATEGORICAS_VENDAS:
+        if col in df.columns:
+            df[col] = to_categorical(df[col], categorias[col])
+    return downcast_numeric(df)
+
+
+def apply_hedge_schema(df_hedge):
+    if df_hedge.empty:
+        return df_hedge
+    for col in CATEGORICAS_HEDGE:
+        if col in df_hedge.columns:
+            conhecidas = STATUS_HEDGE if col == 'Status' else ()
+            df_hedge[col] = to_categorical(df_hedge[col], stable_categories(df_hedge[col].unique(), conhecidas))
+    return downcast_numeric(df_hedge)
+
+
+def apply_futures_schema(df_futuros):
+    if df_futuros.empty:
+        return df_futuros
+    return downcast_numeric(df_futuros)
+
+
+def memory_report(frames):
+    # frames: {nome: DataFrame}; bytes por coluna (incluindo o conteúdo dos objetos) de cada DataFrame
+    linhas = []
+    for nome, frame in frames.items():
+        uso = frame.memory_usage(deep=True, index=True)
+        for col, bytes_col in uso.items():
+            linhas.append({'DataFrame': nome, 'Coluna': str(col),
+                           'Tipo': str(frame[col].dtype) if col in frame.columns else 'index',
+                           'Bytes': int(bytes_col)})
+    return pd.DataFrame(linhas, columns=['DataFrame', 'Coluna', 'Tipo', 'Bytes'])
+
+
+def memory_summary(relatorio):
+    # Total de bytes por DataFrame (cada DataFrame corresponde a uma entrada de cache)
+    return (relatorio.groupby('DataFrame', sort=False)['Bytes'].sum()
+            .reset_index().sort_values('Bytes', ascending=False))
@@ -0,0 +1,191 @@
+# Snapshot publicado da planilha: cada versão vira uma pasta de arquivos Arrow IPC que todos os processos do servidor
+# mapeiam em memória (somente leitura), sem reler nem reprocessar a planilha
+import contextlib
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.ipc
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos; a troca de pasta continua atômica
+    fcntl = None
+
+PASTA_SNAPSHOTS = os.path.join("dados", "snapshots")
+ARQUIVO_ATUAL = "atual.json"
+ARQUIVO_META = "meta.json"
+
+# Snapshots antigos mantidos em disco, para processos que ainda não trocaram de versão
+SNAPSHOTS_MANTIDOS = 2
+
+# Formato das tabelas publicadas: snapshots de outro formato são ignorados e republicados
+FORMATO = 2
+
+
+def snapshot_id(versao_fonte):
+    return f"v{int(round(versao_fonte * 1e6))}"
+
+
+def table_path(pasta_snapshot, nome):
+    return os.path.join(pasta_snapshot, f"{nome}.arrow")
+
+
+def _to_arrow(df):
+    # Nomes de coluna como texto e colunas de objetos mistos (ex.: Código com números e textos) convertidas para texto
+    df = df.rename(columns=str)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_json(caminho, conteudo):
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(conteudo, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+@contextlib.contextmanager
+def _publish_lock(pasta):
+    # Só um processo publica de cada vez; os demais esperam e encontram o snapshot pronto
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(pasta, ".publicacao.lock"), 'w') as trava:
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+def _read_json(caminho):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _current(pasta):
+    return _read_json(os.path.join(pasta, ARQUIVO_ATUAL))
+
+
+def _published(destino):
+    meta = _read_json(os.path.join(destino, ARQUIVO_META))
+    return meta is not None and meta.get('formato') == FORMATO
+
+
+def published_version(pasta):
+    # Versão da fonte do último snapshot publicado (ponteiro atual.json), ou None
+    atual = _current(pasta)
+    return atual.get('versao_fonte') if atual else None
+
+
+def _cleanup(pasta, atual):
+    antigos = sorted((nome for nome in os.listdir(pasta)
+                      if nome.startswith('v') and nome != atual and os.path.isdir(os.path.join(pasta, nome))
+                      and not nome.endswith('.tmp')),
+                     key=lambda nome: int(nome[1:]) if nome[1:].isdigit() else 0)
+    # Arquivos já mapeados por outros processos continuam válidos após a remoção (Linux); no Windows, ficam para depois
+    for nome in antigos[:max(len(antigos) - (SNAPSHOTS_MANTIDOS - 1), 0)]:
+        shutil.rmtree(os.path.join(pasta, nome), ignore_errors=True)
+
+
+def publish(pasta, versao_fonte, preparar):
+    # preparar(): devolve ({nome: função que devolve o DataFrame ou None}, dict de metadados). Só é chamada se esta
+    # versão ainda não foi publicada, já com a trava: todo o trabalho sobre a planilha acontece em um único processo
+    ident = snapshot_id(versao_fonte)
+    destino = os.path.join(pasta, ident)
+    if _published(destino):
+        return ident
+
+    os.makedirs(pasta, exist_ok=True)
+    with _publish_lock(pasta):
+        if _published(destino):
+            return ident
+
+        tabelas, meta = preparar()
+        temporaria = f"{destino}.{os.getpid()}.tmp"
+        shutil.rmtree(temporaria, ignore_errors=True)
+        os.makedirs(temporaria)
+
+        # Erro ao gerar ou gravar uma tabela: a pasta temporária é descartada e o ponteiro não muda
+        try:
+            publicadas = []
+            for nome, gerar in tabelas.items():
+                df = gerar()
+                if df is None:
+                    continue
+                tabela = _to_arrow(df)
+                with pa.OSFile(table_path(temporaria, nome), 'wb') as destino_arquivo:
+                    with pa.ipc.new_file(destino_arquivo, tabela.schema) as escritor:
+                        escritor.write_table(tabela)
+                publicadas.append(nome)
+
+            _write_json(os.path.join(temporaria, ARQUIVO_META),
+                        {'formato': FORMATO, 'versao_fonte': versao_fonte, 'tabelas': publicadas, **meta})
+        except BaseException:
+            shutil.rmtree(temporaria, ignore_errors=True)
+            raise
+
+        # Troca atômica: a pasta só aparece com o nome final quando está completa (uma pasta de formato antigo com o
+        # mesmo nome é removida antes)
+        shutil.rmtree(destino, ignore_errors=True)
+        try:
+            os.rename(temporaria, destino)
+        except OSError:
+            shutil.rmtree(temporaria, ignore_errors=True)
+        # Um processo atrasado publicando uma versão antiga não faz o ponteiro voltar
+        atual = _current(pasta)
+        if atual is None or atual.get('versao_fonte', 0) <= versao_fonte:
+            _write_json(os.path.join(pasta, ARQUIVO_ATUAL), {'id': ident, 'versao_fonte': versao_fonte})
+            _cleanup(pasta, ident)
+    return ident
+
+
+class SharedSnapshot:
+    # Todas as tabelas são mapeadas na abertura: a limpeza de versões antigas pode apagar a pasta depois, e os
+    # mapeamentos já abertos continuam válidos. DataFrames sem cópia apontam para o arquivo: não devem ser alterados
+
+    def __init__(self, pasta_snapshot):
+        self.pasta = pasta_snapshot
+        self.id = os.path.basename(pasta_snapshot)
+        with open(os.path.join(pasta_snapshot, ARQUIVO_META), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self._tabelas = {nome: pa.ipc.open_file(pa.memory_map(table_path(pasta_snapshot, nome), 'r')).read_all()
+                         for nome in self.meta['tabelas']}
+
+    def has(self, nome):
+        return nome in self._tabelas
+
+    def table(self, nome):
+        return self._tabelas[nome]
+
+    def frame(self, nome):
+        # Colunas numéricas e de datas sem nulos e os códigos das categóricas ficam no mapeamento (compartilhado
+        # entre processos pelo cache de páginas do sistema); textos e colunas com nulos são copiados
+        return self._tabelas[nome].to_pandas(split_blocks=True)
+
+    def mapped_bytes(self):
+        return sum(tabela.nbytes for tabela in self._tabelas.values())
+
+    def __sizeof__(self):
+        # No cache, o snapshot pesa o que mantém mapeado: versões antigas saem pelo LRU como qualquer outra entrada
+        return object.__sizeof__(self) + self.mapped_bytes()
+
+
+def open_snapshot(pasta, versao_fonte):
+    # Snapshot publicado da versão pedida, ou None se ainda não existe (ou foi removido enquanto era aberto)
+    destino = os.path.join(pasta, snapshot_id(versao_fonte))
+    if not _published(destino):
+        return None
+    try:
+        return SharedSnapshot(destino)
+    except (OSError, ValueError, pa.ArrowException):
+        return None
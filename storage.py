@@ -0,0 +1,120 @@
+# Armazenamento das vendas (Sheet2) particionado por Safra em arquivos Parquet
+import json
+import os
+
+import pandas as pd
+
+PASTA_PARTICOES = os.path.join("dados", "vendas")
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+# Apenas as safras mais recentes continuam abertas; as mais antigas são fechadas e, se saírem da planilha, continuam
+# disponíveis pela partição
+SAFRAS_ABERTAS = 2
+
+# Dimensões guardadas no manifesto para montar filtros e paletas sem ler as partições
+DIMENSOES = {'Cliente': 'clientes', 'Mercado': 'mercados', 'Qualidade': 'qualidades', 'Peneira': 'peneiras'}
+
+
+def partition_path(safra, pasta=PASTA_PARTICOES):
+    return os.path.join(pasta, f"safra={safra}.parquet")
+
+
+def read_manifest(pasta=PASTA_PARTICOES):
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'versao_fonte': None, 'colunas': [], 'safras': {}}
+
+
+def _write_atomic(caminho, escrever):
+    # Escreve em arquivo temporário e troca de uma vez, para outros processos nunca lerem arquivo pela metade
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    escrever(temporario)
+    os.replace(temporario, caminho)
+
+
+def _normalize(df):
+    # Tipos estáveis para o Parquet: Peneira sempre texto e colunas mistas convertidas para texto
+    df = df.copy()
+    df['Peneira'] = df['Peneira'].astype(str)
+    df['Data Pagamento'] = pd.to_datetime(df['Data Pagamento'], errors='coerce')
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def content_hash(df):
+    # Hash do conteúdo (sem o índice): chave de cache que só muda quando os dados mudam
+    return format(int(pd.util.hash_pandas_object(df, index=False).sum()), 'x') if not df.empty else ''
+
+
+def _dimension_values(df):
+    return {chave: sorted(str(v) for v in df[col].dropna().unique()) for col, chave in DIMENSOES.items()}
+
+
+def read_workbook_partitions(arquivo, sheet_name="Sheet2"):
+    # Sheet2 normalizada e dividida por safra, em memória: (colunas, {safra: DataFrame})
+    df = _normalize(pd.read_excel(arquivo, sheet_name=sheet_name))
+    partes = {int(safra): parte.reset_index(drop=True) for safra, parte in df.groupby('Safra', sort=True)}
+    return list(df.columns), partes
+
+
+def build_manifest(versao_fonte, colunas, partes):
+    # Hash, linhas e dimensões de cada safra; as mais antigas são marcadas como fechadas (imutavel)
+    abertas = set(sorted(partes)[-SAFRAS_ABERTAS:])
+    particoes = {str(safra): {
+        'hash': content_hash(parte),
+        'linhas': len(parte),
+        'imutavel': safra not in abertas,
+        **_dimension_values(parte),
+    } for safra, parte in partes.items()}
+    return {'versao_fonte': versao_fonte, 'colunas': colunas, 'safras': particoes}
+
+
+def sync_partitions(arquivo, sheet_name="Sheet2", pasta=PASTA_PARTICOES):
+    # Atualiza as partições quando a planilha muda: toda safra tem o hash recalculado (a Sheet2 é lida inteira de
+    # qualquer forma) e só as partições com conteúdo diferente são regravadas, inclusive as de safras fechadas.
+    # Falhas de escrita (pasta sem permissão) sobem como OSError
+    versao_fonte = os.path.getmtime(arquivo)
+    anterior = read_manifest(pasta)
+    if anterior['versao_fonte'] == versao_fonte:
+        return anterior
+
+    colunas, partes = read_workbook_partitions(arquivo, sheet_name)
+    manifesto = build_manifest(versao_fonte, colunas, partes)
+    os.makedirs(pasta, exist_ok=True)
+
+    for safra, parte in partes.items():
+        info_anterior = anterior['safras'].get(str(safra))
+        if not (info_anterior and info_anterior['hash'] == manifesto['safras'][str(safra)]['hash']
+                and os.path.exists(partition_path(safra, pasta))):
+            _write_atomic(partition_path(safra, pasta), lambda caminho: parte.to_parquet(caminho, index=False))
+
+    # Safras fechadas que saíram da planilha continuam disponíveis a partir da partição
+    for safra, info_anterior in anterior['safras'].items():
+        if safra not in manifesto['safras'] and info_anterior['imutavel'] \
+                and os.path.exists(partition_path(safra, pasta)):
+            manifesto['safras'][safra] = info_anterior
+
+    def escrever_manifesto(caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False)
+
+    _write_atomic(os.path.join(pasta, ARQUIVO_MANIFESTO), escrever_manifesto)
+    return manifesto
+
+
+def read_partition(safra, pasta=PASTA_PARTICOES):
+    return pd.read_parquet(partition_path(safra, pasta))
+
+
+def manifest_values(manifesto, chave):
+    # União dos valores de uma dimensão em todas as safras (mantém filtros e cores estáveis)
+    return sorted({v for info in manifesto['safras'].values() for v in info[chave]})
+
+
+def categories_hash(manifesto):
+    # Hash das categorias de todas as dimensões: só muda quando surge ou some um cliente, mercado, qualidade, peneira
+    categorias = {chave: manifest_values(manifesto, chave) for chave in DIMENSOES.values()}
+    return content_hash(pd.DataFrame({'categoria': [json.dumps(categorias, sort_keys=True, ensure_ascii=False)]}))
@@ -0,0 +1,39 @@
+# Os módulos do dashboard ficam na raiz do repositório (mesmo layout do `streamlit run app.py`)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+
+import cache  # noqa: E402
+import dataset  # noqa: E402
+
+PLANILHA_EXEMPLO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vendas_cafe_em_reais.xlsx")
+
+
+@pytest.fixture
+def workbook(tmp_path, monkeypatch):
+    # Cópia das abas da planilha de exemplo em pasta temporária, com partições, snapshots e cache isolados.
+    # Devolve uma função que regrava a planilha (abas alteradas por parâmetro) e a nova versão
+    monkeypatch.setenv("VENDAS_CAFE_ARQUIVO", str(tmp_path / "vendas.xlsx"))
+    monkeypatch.setenv("VENDAS_CAFE_PARTICOES", str(tmp_path / "vendas"))
+    monkeypatch.setenv("VENDAS_CAFE_SNAPSHOTS", str(tmp_path / "snapshots"))
+    abas = pd.read_excel(PLANILHA_EXEMPLO, sheet_name=['Sheet2', 'futuros', 'hedge', 'medias_historicas'])
+    cache.CACHE.clear()
+
+    def gravar(**alteradas):
+        abas.update(alteradas)
+        with pd.ExcelWriter(dataset.workbook_path()) as writer:
+            for nome, df in abas.items():
+                df.to_excel(writer, sheet_name=nome, index=False)
+        # mtime sempre crescente, mesmo com gravações no mesmo instante
+        versao = max(os.path.getmtime(dataset.workbook_path()), gravar.versao + 1)
+        os.utime(dataset.workbook_path(), (versao, versao))
+        gravar.versao = versao
+        return versao
+
+    gravar.versao = 0
+    yield gravar
+    cache.CACHE.clear()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregates
+import dataset
+
+
+def rollup(clientes, semente):
+    rng = np.random.default_rng(semente)
+    sacas = rng.integers(50, 2000, len(clientes)).astype(float)
+    return pd.DataFrame({
+        'Cliente': clientes,
+        'Qualidade': rng.choice(['Petrus', 'Rio', 'Vários'], len(clientes)),
+        'Mercado': rng.choice(['Exportação', 'Mercado Interno'], len(clientes)),
+        '# Sacas': sacas,
+        'Receita R$': sacas * rng.uniform(900, 1800, len(clientes)),
+    })
+
+
+# Itens só na base (saiu), só na comparada (novo) e nos dois; base vazia
+@pytest.mark.parametrize('clientes_base, clientes_comparada', [
+    (['Itah', 'Melitta', 'Southland', 'Itah'], ['Itah', 'Southland', 'Wells Coffee', 'Wells Coffee']),
+    ([], ['Itah', 'Southland']),
+    (['Itah', 'Southland'], []),
+])
+@pytest.mark.parametrize('dimensao', aggregates.DIMENSOES_COMPARACAO)
+def test_volume_mix_price_add_up_to_revenue_change(clientes_base, clientes_comparada, dimensao):
+    comparacao = aggregates.compare_safras(rollup(clientes_base, 1), rollup(clientes_comparada, 2), dimensao)
+
+    efeitos = comparacao['Efeito Volume'] + comparacao['Efeito Mix'] + comparacao['Efeito Preço']
+    np.testing.assert_allclose(efeitos, comparacao['Δ Receita'], rtol=1e-9, atol=1e-6)
+
+    resumo = aggregates.summarize_price_mix(comparacao)
+    assert resumo['Receita Base'] + resumo['Efeito Volume'] + resumo['Efeito Mix'] + resumo['Efeito Preço'] == \
+        pytest.approx(resumo['Receita Comparada'])
+
+
+def test_same_mix_and_prices_is_pure_volume_effect():
+    base = rollup(['Itah', 'Southland', 'Melitta'], 3)
+    dobrada = base.assign(**{'# Sacas': base['# Sacas'] * 2, 'Receita R$': base['Receita R$'] * 2})
+
+    comparacao = aggregates.compare_safras(base, dobrada, 'Cliente')
+
+    np.testing.assert_allclose(comparacao['Efeito Volume'], comparacao['Δ Receita'])
+    np.testing.assert_allclose(comparacao[['Efeito Mix', 'Efeito Preço']], 0.0, atol=1e-6)
+
+
+def test_sidebar_filters_on_rollup_match_filtering_the_rows():
+    rng = np.random.default_rng(5)
+    n = 300
+    vendas = pd.DataFrame({
+        'Safra': 2025,
+        'Cliente': pd.Categorical(rng.choice(['Itah', 'Melitta', 'Estoque'], n)),
+        'Qualidade': pd.Categorical(rng.choice(['Petrus', 'Rio'], n)),
+        'Mercado': pd.Categorical(rng.choice(['Exportação', 'Mercado Interno'], n)),
+        '# Sacas': rng.uniform(10, 500, n),
+        'Receita R$': rng.uniform(1e4, 5e5, n),
+    })
+    filtros = (['Exportação'], ['Itah', 'Estoque'], ['Petrus'], False)
+
+    rollup = aggregates.safra_rollup(2025, 'teste-rollup', 5.5, '', vendas)
+    filtrado = aggregates.filter_rollup(rollup, *filtros)
+    linhas = dataset.filter_sales(vendas, [2025], *filtros[:3], incluir_estimativas=False)
+
+    assert filtrado['# Sacas'].sum() == pytest.approx(linhas['# Sacas'].sum())
+    assert filtrado['Receita R$'].sum() == pytest.approx(linhas['Receita R$'].sum())
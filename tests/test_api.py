@@ -0,0 +1,62 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import api
+
+
+@pytest.fixture
+def server():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), api.AggregatesHandler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def get(url, **headers):
+    try:
+        with urlopen(Request(url, headers=headers)) as resposta:
+            return resposta.status, resposta.headers, resposta.read()
+    except HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_etag_returns_304_until_content_changes(server, workbook):
+    workbook()
+    status, headers, corpo = get(f"{server}/metricas?safras=2025&dolar=5.5")
+    assert status == 200 and headers['ETag']
+
+    status, _, corpo_304 = get(f"{server}/metricas?safras=2025&dolar=5.5", **{'If-None-Match': headers['ETag']})
+    assert status == 304 and corpo_304 == b''
+
+    # Outra cotação muda o conteúdo e, com ele, a ETag
+    status, outros_headers, _ = get(f"{server}/metricas?safras=2025&dolar=6.0", **{'If-None-Match': headers['ETag']})
+    assert status == 200 and outros_headers['ETag'] != headers['ETag']
+
+
+@pytest.mark.parametrize('dolar', ['nan', 'inf', '-1', 'abc'])
+def test_invalid_dollar_is_rejected(server, workbook, dolar):
+    workbook()
+    status, _, corpo = get(f"{server}/metricas?dolar={dolar}")
+    assert status == 400 and 'erro' in json.loads(corpo)
+
+
+def test_missing_workbook_returns_503(server, workbook):
+    status, _, corpo = get(f"{server}/metricas")
+    assert status == 503 and json.loads(corpo)['erro']
+
+
+def test_route_failure_returns_500(server, workbook, monkeypatch):
+    workbook()
+
+    def falhar(versao, filtros, chave):
+        raise KeyError('Safra')
+
+    monkeypatch.setitem(api.ROTAS, '/metricas', falhar)
+    status, _, corpo = get(f"{server}/metricas")
+    assert status == 500 and 'KeyError' in json.loads(corpo)['erro']
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache
+
+
+def array(n_bytes):
+    return np.zeros(n_bytes // 8)
+
+
+def test_evicts_least_recently_used_within_budget():
+    lru = cache.BudgetedCache(3000)
+    for chave in 'abc':
+        lru.put(chave, array(1000))
+    assert lru.get('a')[0]
+
+    # 'b' é a menos usada desde o acesso a 'a'
+    lru.put('d', array(1000))
+    assert [chave for chave, _, _ in lru.entries()] == ['c', 'a', 'd']
+    assert lru.stats()['despejos'] == 1
+    assert lru.get('b') == (False, None)
+
+
+def test_byte_accounting_follows_puts_replacements_and_evictions():
+    lru = cache.BudgetedCache(10_000)
+    lru.put('a', array(4000))
+    lru.put('b', array(4000))
+    assert lru.stats()['bytes_ocupados'] == 8000
+
+    # Regravar a mesma chave troca o tamanho em vez de somar
+    lru.put('a', array(2000))
+    assert lru.stats()['bytes_ocupados'] == 6000
+    assert sum(tamanho for _, tamanho, _ in lru.entries()) == 6000
+
+    lru.put('c', array(6000))
+    assert [chave for chave, _, _ in lru.entries()] == ['a', 'c']
+    assert lru.stats()['bytes_ocupados'] == 8000 <= lru.orcamento_bytes
+
+    # Valor maior que o orçamento inteiro não fica no cache
+    lru.put('enorme', array(20_000))
+    assert lru.stats()['bytes_ocupados'] == 0 and lru.entries() == []
+
+
+def test_dataframe_size_includes_string_contents():
+    curtas = pd.DataFrame({'Cliente': ['a'] * 100})
+    longas = pd.DataFrame({'Cliente': ['x' * 200] * 100})
+    assert cache.estimate_size(longas) > cache.estimate_size(curtas) + 100 * 190
+
+
+def test_memoize_skips_underscore_parameters_in_the_key():
+    chamadas = []
+
+    @cache.memoize
+    def somar(versao, _df):
+        chamadas.append(versao)
+        return float(_df['x'].sum())
+
+    df = pd.DataFrame({'x': [1.0, 2.0]})
+    cache.CACHE.clear()
+    assert somar(1, df) == 3.0
+    assert somar(1, pd.DataFrame({'x': [100.0]})) == 3.0
+    assert somar(2, df) == 3.0
+    assert chamadas == [1, 2]
+
+
+def run_concurrently(n, funcao):
+    # Dispara n chamadas ao mesmo tempo; devolve os resultados (ou exceções) de cada uma
+    resultados = [None] * n
+    largada = threading.Barrier(n)
+
+    def executar(i):
+        largada.wait()
+        try:
+            resultados[i] = funcao()
+        except Exception as e:
+            resultados[i] = e
+
+    threads = [threading.Thread(target=executar, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return resultados
+
+
+def test_concurrent_misses_share_a_single_computation():
+    lru = cache.BudgetedCache(10_000)
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        time.sleep(0.2)
+        return 'valor'
+
+    resultados = run_concurrently(8, lambda: lru.get_or_compute('chave', calcular))
+
+    assert resultados == ['valor'] * 8
+    assert len(chamadas) == 1
+    stats = lru.stats()
+    assert stats['faltas'] == 1 and stats['deduplicados'] == 7 and stats['em_andamento'] == 0
+    assert stats['espera_max_s'] > 0
+
+
+def test_error_reaches_every_waiter_and_next_call_retries():
+    lru = cache.BudgetedCache(10_000)
+    chamadas = []
+
+    def falhar():
+        chamadas.append(1)
+        time.sleep(0.2)
+        raise RuntimeError('planilha travada')
+
+    resultados = run_concurrently(5, lambda: lru.get_or_compute('chave', falhar))
+
+    assert len(chamadas) == 1
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+    assert lru.entries() == [] and lru.stats()['em_andamento'] == 0
+
+    # O erro não fica no cache: a próxima chamada calcula de novo
+    assert lru.get_or_compute('chave', lambda: 'recuperado') == 'recuperado'
+    assert lru.get_or_compute('chave', falhar) == 'recuperado'
+
+
+def test_different_keys_compute_in_parallel():
+    lru = cache.BudgetedCache(10_000)
+
+    inicio = time.perf_counter()
+    resultados = run_concurrently(4, lambda: lru.get_or_compute(threading.get_ident(),
+                                                                lambda: time.sleep(0.2) or 'ok'))
+
+    assert resultados == ['ok'] * 4
+    assert lru.stats()['deduplicados'] == 0
+    assert time.perf_counter() - inicio < 0.6
+
+
+def test_base_exceptions_release_waiters():
+    lru = cache.BudgetedCache(10_000)
+
+    def interromper():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        lru.get_or_compute('chave', interromper)
+    assert lru.get_or_compute('chave', lambda: 1) == 1
@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+import cache
+import dataset
+
+
+def write_sheets(caminho, **abas):
+    with pd.ExcelWriter(caminho) as writer:
+        for nome, df in abas.items():
+            df.to_excel(writer, sheet_name=nome, index=False)
+    return str(caminho)
+
+
+def test_monthly_ptax_curve_matches_payment_month(tmp_path, monkeypatch):
+    historico = pd.DataFrame({'Data': pd.to_datetime(['2024-01-31', '2024-02-29']), 'BRL=X': [5.0, 6.0]})
+    monkeypatch.setenv("VENDAS_CAFE_ARQUIVO", write_sheets(tmp_path / 'v.xlsx', medias_historicas=historico))
+
+    curva = dataset.read_ptax_curve()
+    vendas = pd.DataFrame({
+        'PTAX': [float('nan')] * 4,
+        'Data Pagamento': pd.to_datetime(['2024-01-10', '2024-02-15', '2024-02-29', '2024-03-01']),
+    })
+    resultado = dataset.apply_ptax_curve(vendas, curva, 9.0)
+
+    # Meio do mês usa a média do próprio mês; depois do último mês coberto, a cotação da sidebar
+    assert resultado['PTAX'].tolist() == [5.0, 6.0, 6.0, 9.0]
+
+
+def test_daily_ptax_curve_keeps_fixed_ptax(tmp_path, monkeypatch):
+    ptax = pd.DataFrame({'Data': pd.to_datetime(['2024-01-02', '2024-01-03']), 'PTAX': [4.9, 5.1]})
+    monkeypatch.setenv("VENDAS_CAFE_ARQUIVO", write_sheets(tmp_path / 'v.xlsx', ptax=ptax))
+
+    vendas = pd.DataFrame({'PTAX': [5.5, float('nan'), float('nan')],
+                           'Data Pagamento': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04'])})
+    resultado = dataset.apply_ptax_curve(vendas, dataset.read_ptax_curve(), 9.0)
+
+    assert resultado['PTAX'].tolist() == [5.5, 5.1, 9.0]
+
+
+def test_saving_workbook_reuses_unchanged_safras(workbook, monkeypatch):
+    versao = workbook()
+    antes = dataset.load_partitions([2024, 2025], 5.5, versao)
+
+    lidas = []
+    preparar = dataset.prepare_safra
+    monkeypatch.setattr(dataset, 'prepare_safra', lambda safra, *args: lidas.append(safra) or preparar(safra, *args))
+
+    # Salvar a planilha alterando só o hedge não reprepara nenhuma safra
+    hedge = pd.read_excel(dataset.workbook_path(), sheet_name='hedge')
+    versao = workbook(hedge=hedge.iloc[:-1])
+    depois = dataset.load_partitions([2024, 2025], 5.5, versao)
+    assert lidas == []
+    assert all(depois[safra] is antes[safra] for safra in antes)
+
+    # Alterar uma venda de 2025 reprepara só essa safra
+    vendas = pd.read_excel(dataset.workbook_path(), sheet_name='Sheet2')
+    vendas.loc[vendas['Safra'] == 2025, '# Sacas'] += 1
+    dataset.load_partitions([2024, 2025], 5.5, workbook(Sheet2=vendas))
+    assert lidas == [2025]
+
+
+def test_edits_to_closed_safras_are_picked_up(workbook):
+    versao = workbook()
+    manifesto = dataset.load_manifest(versao)
+    assert manifesto['safras']['2023']['imutavel']
+    antes = dataset.load_data([2023], 5.5, versao)['# Sacas'].sum()
+
+    vendas = pd.read_excel(dataset.workbook_path(), sheet_name='Sheet2')
+    vendas.loc[vendas['Safra'] == 2023, '# Sacas'] *= 10
+    depois = dataset.load_data([2023], 5.5, workbook(Sheet2=vendas))['# Sacas'].sum()
+
+    assert depois == pytest.approx(10 * antes)
+
+
+def test_read_only_data_folders_fall_back_to_memory(workbook, tmp_path, monkeypatch):
+    versao = workbook()
+    esperado = dataset.load_data([2024, 2025], 5.5, versao)
+
+    # Caminhos sob um arquivo comum: criar as pastas falha com NotADirectoryError
+    bloqueio = tmp_path / "somente_leitura"
+    bloqueio.write_text("")
+    monkeypatch.setenv("VENDAS_CAFE_PARTICOES", str(bloqueio / "vendas"))
+    monkeypatch.setenv("VENDAS_CAFE_SNAPSHOTS", str(bloqueio / "snapshots"))
+    cache.CACHE.clear()
+
+    assert dataset.load_manifest(versao).get('em_memoria')
+    pd.testing.assert_frame_equal(dataset.load_data([2024, 2025], 5.5, versao), esperado)
@@ -0,0 +1,102 @@
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import feed
+
+
+def test_file_source_waits_for_complete_lines(tmp_path):
+    caminho = tmp_path / "ticks.csv"
+    caminho.write_text("2025-12-20T10:00:00,350.1\n352.", encoding='utf-8')
+    fonte = feed.FileTickSource(str(caminho))
+
+    assert [preco for _, preco in fonte.read()] == [350.1]
+    with open(caminho, 'a', encoding='utf-8') as f:
+        f.write("4\n")
+    assert [preco for _, preco in fonte.read()] == [352.4]
+    assert fonte.read() == []
+
+
+def test_file_source_skips_invalid_lines(tmp_path):
+    caminho = tmp_path / "ticks.csv"
+    caminho.write_text("preço\n2025-12-20T10:00:00,abc\nontem,351\n\n353.5\n", encoding='utf-8')
+
+    assert [preco for _, preco in feed.FileTickSource(str(caminho)).read()] == [353.5]
+
+
+def test_file_source_restarts_after_truncation(tmp_path):
+    caminho = tmp_path / "ticks.csv"
+    caminho.write_text("350.0\n351.0\n352.0\n", encoding='utf-8')
+    fonte = feed.FileTickSource(str(caminho))
+    assert len(fonte.read()) == 3
+
+    # Arquivo recriado menor: volta ao início em vez de ler a partir da posição antiga
+    caminho.write_text("340.0\n", encoding='utf-8')
+    assert [preco for _, preco in fonte.read()] == [340.0]
+
+
+def test_file_source_missing_file(tmp_path):
+    assert feed.FileTickSource(str(tmp_path / "ausente.csv")).read() == []
+
+
+class ListSource:
+
+    def __init__(self, precos):
+        self.precos = list(precos)
+        self.fechada = False
+
+    def read(self):
+        ticks, self.precos = [(pd.Timestamp('2025-12-20'), p) for p in self.precos], []
+        return ticks
+
+    def close(self):
+        self.fechada = True
+
+
+def test_incremental_total_matches_per_contract_revaluation():
+    hedge = pd.DataFrame({
+        'Status': ['Financeiro', 'Físico', 'Liquidado', 'Financeiro'],
+        'Preço (cts/lb)': [350.0, 362.5, 300.0, np.nan],
+        '# Sacas': [1000.0, 2500.0, 800.0, 100.0],
+    })
+    feed_ao_vivo = feed.LiveFeed(ListSource([355.0, 341.25]))
+    feed_ao_vivo.set_contracts(hedge, versao=1)
+    feed_ao_vivo.poll()
+
+    contratos = feed_ao_vivo.revalue(5.5)
+    assert len(contratos) == 2
+    assert feed_ao_vivo.history(5.5)['Resultado R$'].iloc[-1] == pytest.approx(
+        contratos['Resultado ao Vivo R$'].sum())
+    assert feed_ao_vivo._total_usd(341.25) * 5.5 == pytest.approx(contratos['Resultado ao Vivo R$'].sum())
+
+
+def test_shared_feed_only_opens_configured_sources_one_per_source(tmp_path, monkeypatch):
+    a, b = f"arquivo:{tmp_path / 'a.csv'}", f"arquivo:{tmp_path / 'b.csv'}"
+    (tmp_path / 'a.csv').write_text("350.0\n", encoding='utf-8')
+    monkeypatch.setattr(feed, 'FONTES_PERMITIDAS', [a, b])
+    monkeypatch.setattr(feed, '_feeds', {})
+
+    with pytest.raises(ValueError):
+        feed.shared_feed("socket:0.0.0.0:9999")
+
+    primeiro = feed.shared_feed(a)
+    assert feed.shared_feed(a) is primeiro
+    # Outra sessão troca para a fonte b: o feed da fonte a continua aberto para quem o usa
+    segundo = feed.shared_feed(b)
+    assert segundo is not primeiro and not primeiro.fechado
+    assert primeiro.poll() == 1
+    assert feed.shared_feed(a) is primeiro
+
+
+@pytest.mark.parametrize('valor', ['', ' , '])
+def test_empty_feed_setting_falls_back_to_builtin_source(monkeypatch, valor):
+    monkeypatch.setenv("VENDAS_CAFE_FEED", valor)
+    recarregado = importlib.reload(feed)
+    try:
+        assert recarregado.FONTES_PERMITIDAS == [recarregado.FONTE_EMBUTIDA]
+        assert recarregado.FONTE_PADRAO == recarregado.FONTE_EMBUTIDA
+    finally:
+        monkeypatch.delenv("VENDAS_CAFE_FEED")
+        importlib.reload(feed)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import hedge_coverage
+
+
+def test_installments_are_spread_over_consecutive_months():
+    vendas = pd.DataFrame({
+        'Preço (u$/sc)': [300.0, 200.0, np.nan],
+        '# Sacas': [300.0, 100.0, 50.0],
+        'Parcelas': [3, 0, 1],
+        'Data Pagamento': pd.to_datetime(['2025-11-10', '2025-12-05', '2025-11-01']),
+    })
+
+    baldes = hedge_coverage.bucket_sales(vendas)
+
+    # Nov, Dez e Jan recebem 1/3 da primeira venda; a segunda (0 parcelas = 1) vai inteira para Dez; sem preço U$ fica
+    # fora
+    assert list(hedge_coverage.month_to_date(baldes.index).dt.strftime('%Y-%m')) == ['2025-11', '2025-12', '2026-01']
+    assert baldes['Sacas Físicas'].tolist() == pytest.approx([100.0, 200.0, 100.0])
+    assert baldes['Receita U$'].tolist() == pytest.approx([30_000.0, 50_000.0, 30_000.0])
+    assert baldes['Sacas Físicas'].sum() == pytest.approx(400.0)
+
+
+def test_only_open_contracts_enter_the_hedge_book():
+    hedge = pd.DataFrame({
+        'Status': ['Financeiro', 'Físico', 'Liquidado', 'Financeiro'],
+        'Vencimento': pd.to_datetime(['2025-12-15', '2025-12-20', '2025-12-01', None]),
+        '# Sacas': [100.0, 50.0, 1000.0, 70.0],
+    })
+
+    baldes = hedge_coverage.bucket_hedge(hedge)
+
+    assert baldes['Sacas Hedge'].tolist() == [150.0]
+    assert hedge_coverage.bucket_hedge(pd.DataFrame()).empty
+
+
+def test_hedge_only_months_do_not_inflate_coverage():
+    meses = pd.Index([24_300, 24_301, 24_302], name='Mês')
+    fisico = pd.DataFrame({'Sacas Físicas': [100.0, 100.0], 'Receita U$': [30_000.0, 20_000.0]}, index=meses[:2])
+    hedge = pd.DataFrame({'Sacas Hedge': [40.0, 500.0]}, index=meses[[0, 2]])
+
+    ladder = hedge_coverage.build_ladder(fisico, hedge)
+
+    assert ladder['Sacas Físicas'].tolist() == [100.0, 100.0, 0.0]
+    assert ladder['Sacas Cobertas'].tolist() == [40.0, 0.0, 0.0]
+    assert ladder['Sacas Descobertas'].tolist() == [60.0, 100.0, 0.0]
+    assert ladder['Exposição Descoberta U$'].tolist() == pytest.approx([18_000.0, 20_000.0, 0.0])
+    assert ladder['Cobertura (%)'].isna().tolist() == [False, False, True]
+    assert hedge_coverage.total_coverage(ladder) == pytest.approx(20.0)
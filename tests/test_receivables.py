@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+import receivables
+
+
+def ledger_example(n=400, semente=3):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'Cliente': rng.choice(['Southland', 'Itah', 'Melitta', 'Estoque'], n),
+        'Data': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 600, n), unit='D'),
+        'Valor': rng.uniform(1_000, 100_000, n).round(2),
+    })
+
+
+def brute_force_aging(ledger, data_posicao):
+    # Mesma regra do índice, parcela a parcela: dias após a posição em (início, fim] de cada faixa
+    dias = (ledger['Data'] - pd.Timestamp(data_posicao)).dt.days
+    limites = receivables.FAIXAS_DIAS + [np.inf]
+    faixas = {rotulo: ledger['Valor'].where((dias > limites[i]) & (dias <= limites[i + 1]), 0.0)
+              for i, rotulo in enumerate(receivables.ROTULOS_FAIXAS)}
+    resultado = pd.DataFrame(faixas).groupby(ledger['Cliente']).sum()
+    resultado.insert(0, 'Saldo a Receber', ledger['Valor'].where(dias > 0, 0.0).groupby(ledger['Cliente']).sum())
+    return resultado
+
+
+def test_aging_matches_brute_force_on_every_position():
+    ledger = ledger_example()
+    indice = receivables.build_index(('teste-aging',), ledger)
+
+    for data_posicao in ['2024-12-01', '2025-01-01', '2025-03-15', '2025-12-31', '2027-01-01']:
+        esperado = brute_force_aging(ledger, data_posicao)
+        pd.testing.assert_frame_equal(receivables.aging(indice, data_posicao), esperado, check_names=False,
+                                      check_index_type=False)
+
+
+def test_aging_boundaries_are_inclusive_at_the_end_of_each_bucket():
+    ledger = pd.DataFrame({'Cliente': ['Itah'] * 4, 'Valor': [1.0, 10.0, 100.0, 1000.0],
+                           'Data': pd.to_datetime(['2025-01-01', '2025-01-31', '2025-02-01', '2025-07-01'])})
+    linha = receivables.aging(receivables.build_index(('teste-faixas',), ledger), '2025-01-01').loc['Itah']
+
+    # Parcela na própria data de posição já não está a receber
+    assert linha['Saldo a Receber'] == 1110.0
+    assert linha['A vencer 0-30d'] == 10.0
+    assert linha['A vencer 31-60d'] == 100.0
+    assert linha['A vencer >180d'] == 1000.0
+
+
+def test_credit_exposure_excludes_own_stock_and_applies_limits():
+    ledger = ledger_example()
+    indice = receivables.build_index(('teste-exposicao',), ledger)
+    exposicao = receivables.credit_exposure(indice, '2025-01-01', {'Southland': 4, 'Itah': 1},
+                                            {4: 1e12, 1: 1.0})
+
+    assert 'Estoque' not in exposicao.index
+    assert exposicao.loc['Southland', 'Situação'] == 'Dentro do limite'
+    assert exposicao.loc['Itah', 'Situação'] == 'Acima do limite'
+    assert exposicao.loc['Melitta', 'Situação'] == 'Sem score'
+
+
+def test_credit_limits_come_from_configuration(monkeypatch):
+    exemplo = {5: 5_000_000, 1: 300_000}
+
+    monkeypatch.delenv("VENDAS_CAFE_LIMITES_CREDITO", raising=False)
+    assert receivables.load_credit_limits(exemplo) == (exemplo, False)
+
+    monkeypatch.setenv("VENDAS_CAFE_LIMITES_CREDITO", '{"5": 2000000, "3": 500000.5}')
+    assert receivables.load_credit_limits(exemplo) == ({5: 2_000_000.0, 3: 500_000.5}, True)
+
+    for invalido in ['{"5": ', '[1, 2]', '{"cinco": 1}', '{}']:
+        monkeypatch.setenv("VENDAS_CAFE_LIMITES_CREDITO", invalido)
+        assert receivables.load_credit_limits(exemplo) == (exemplo, False)
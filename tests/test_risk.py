@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import risk
+from dataset import month_index
+
+# Grade de 3 meses começando em nov/2025
+MES_INICIAL = int(month_index(pd.Series(pd.to_datetime(['2025-11-01'])))[0])
+
+
+def test_simulation_is_reproducible_and_independent_of_batch_split():
+    vendas = np.full(12, 1e6)
+    hedge = np.full(12, 1e5)
+    argumentos = (vendas, hedge, hedge, 5.5, risk.PARAMETROS_PADRAO)
+
+    cenarios = risk.run_simulation(*argumentos, n_cenarios=5000, semente=7)
+
+    assert cenarios.shape == (5000, 12)
+    np.testing.assert_array_equal(cenarios, risk.run_simulation(*argumentos, n_cenarios=5000, semente=7))
+    # Os primeiros lotes não dependem do total de cenários pedido
+    np.testing.assert_array_equal(cenarios[:risk.TAMANHO_LOTE],
+                                  risk.run_simulation(*argumentos, n_cenarios=risk.TAMANHO_LOTE, semente=7))
+
+
+def test_sales_exposure_spreads_parcels_and_skips_fixed_ptax():
+    vendas = pd.DataFrame({
+        'Preço (u$/sc)': [300.0, 200.0, 250.0, 100.0, np.nan],
+        '# Sacas': [30.0, 10.0, 10.0, 10.0, 10.0],
+        'Parcelas': [3, 1, 1, 1, 1],
+        'Data Pagamento': pd.to_datetime(['2025-12-10', '2025-11-05', '2025-11-20', '2025-10-01', '2025-11-01']),
+        'PTAX Fixada': [False, False, True, False, False],
+    })
+
+    exposicao = risk.build_sales_exposure(vendas, MES_INICIAL, 3)
+
+    # 9.000 em 3 parcelas a partir de dez: a de fev cai fora do horizonte; a venda de out está antes da grade;
+    # a de PTAX fixada e a sem preço em U$ não entram
+    np.testing.assert_allclose(exposicao, [2_000.0, 3_000.0, 3_000.0])
+    np.testing.assert_array_equal(risk.build_sales_exposure(vendas.iloc[:0], MES_INICIAL, 3), np.zeros(3))
+
+
+def test_hedge_exposure_clips_to_horizon_and_skips_settled():
+    hedge = pd.DataFrame({
+        'Status': ['Financeiro', 'Físico', 'Liquidado', 'Financeiro'],
+        'Vencimento': pd.to_datetime(['2025-09-15', '2025-12-15', '2025-11-15', '2026-03-15']),
+        'Preço (cts/lb)': [400.0, 380.0, 350.0, 420.0],
+        'Liq. (cts/lb)': [390.0, 370.0, 340.0, 410.0],
+        '# Sacas': [10.0, 20.0, 100.0, 30.0],
+    })
+
+    fixo, exposto = risk.build_hedge_exposure(hedge, MES_INICIAL, 3)
+
+    # O vencido e não liquidado vai para o primeiro mês; o de mar/26 passa do horizonte; o liquidado não entra
+    np.testing.assert_allclose(fixo, np.array([400.0 * 10, 380.0 * 20, 0.0]) * risk.FATOR_SACA)
+    np.testing.assert_allclose(exposto, np.array([390.0 * 10, 370.0 * 20, 0.0]) * risk.FATOR_SACA)
+
+
+def test_hedge_exposure_without_required_columns_is_zero():
+    fixo, exposto = risk.build_hedge_exposure(pd.DataFrame({'Status': ['Financeiro']}), MES_INICIAL, 2)
+
+    assert fixo.tolist() == exposto.tolist() == pytest.approx([0.0, 0.0])
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+import dataset
+import schema
+
+
+def test_floats_are_downcast_only_when_exact():
+    df = pd.DataFrame({
+        'Sacas': [100.0, 250.5, np.nan],
+        'Bebida': [0.1, 0.2, 0.3],
+        'Preço (u$/sc)': [300.0, 310.0, 320.0],
+        'Parcelas': np.array([1, 3, 12], dtype='int64'),
+        'PTAX Fixada': [True, False, True],
+    })
+
+    compacto = schema.downcast_numeric(df.copy())
+
+    # 0.1 não tem representação exata em float32: a coluna fica em float64; as monetárias nunca mudam
+    assert compacto['Sacas'].dtype == 'float32'
+    assert compacto['Bebida'].dtype == 'float64'
+    assert compacto['Preço (u$/sc)'].dtype == 'float64'
+    assert compacto['Parcelas'].dtype == 'int8'
+    assert compacto['PTAX Fixada'].dtype == bool
+    for col in df.columns:
+        np.testing.assert_array_equal(compacto[col].to_numpy(dtype=df[col].dtype), df[col].to_numpy())
+
+
+def test_categories_are_the_same_across_safras():
+    safras = {
+        2024: pd.DataFrame({'Cliente': ['Itah', 'Melitta'], 'Peneira': [17, '16/18']}),
+        2025: pd.DataFrame({'Cliente': ['Southland', None], 'Peneira': ['16/18', 17]}),
+    }
+    categorias = {col: schema.stable_categories(pd.concat([parte[col] for parte in safras.values()]).unique())
+                  for col in ['Cliente', 'Peneira']}
+
+    convertidas = {safra: {col: schema.to_categorical(parte[col], categorias[col]) for col in categorias}
+                   for safra, parte in safras.items()}
+
+    # Mesmas categorias em todas as safras: concatenar mantém o tipo categórico e os códigos batem
+    assert categorias['Cliente'] == ['Itah', 'Melitta', 'Southland']
+    assert categorias['Peneira'] == ['16/18', '17']
+    juntas = pd.concat([pd.Series(convertidas[s]['Cliente']) for s in safras], ignore_index=True)
+    assert isinstance(juntas.dtype, pd.CategoricalDtype)
+    assert juntas.isna().tolist() == [False, False, False, True]
+    assert (convertidas[2024]['Peneira'].codes[0] == convertidas[2025]['Peneira'].codes[1])
+
+
+def test_known_categories_come_first():
+    assert schema.stable_categories(['Físico', 'Cancelado', 'Liquidado'], schema.STATUS_HEDGE) == \
+        ['Liquidado', 'Financeiro', 'Físico', 'Cancelado']
+    assert schema.stable_categories(['b', 'a', np.nan, 'a']) == ['a', 'b']
+
+
+def test_prepared_safras_share_the_manifest_categories(workbook):
+    versao = workbook()
+    partes = dataset.load_partitions([2024, 2025], 5.5, versao)
+
+    for col in schema.CATEGORICAS_VENDAS:
+        assert partes[2024][col].cat.categories.equals(partes[2025][col].cat.categories)
+    assert isinstance(pd.concat(partes.values())['Cliente'].dtype, pd.CategoricalDtype)
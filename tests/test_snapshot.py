@@ -0,0 +1,115 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache
+import dataset
+import snapshot
+import storage
+
+
+def new_process():
+    # Outro processo do servidor: mesmo disco, cache vazio
+    cache.CACHE.clear()
+
+
+def test_sales_columns_are_shared_across_dollar_rates(workbook):
+    versao = workbook()
+    a = dataset.load_partitions([2025], 5.0, versao)[2025]
+    b = dataset.load_partitions([2025], 6.0, versao)[2025]
+
+    # Só as colunas que dependem da cotação são novas; as demais são as mesmas da safra preparada, e as sem nulos
+    # apontam para o arquivo mapeado (somente leitura)
+    for col in ['# Sacas', 'Preço (u$/sc)', 'Data Pagamento']:
+        assert np.shares_memory(a[col].to_numpy(), b[col].to_numpy())
+    assert not a['# Sacas'].to_numpy().flags.writeable
+    assert not np.shares_memory(a['Receita R$'].to_numpy(), b['Receita R$'].to_numpy())
+    assert (b.loc[~b['PTAX Fixada'], 'PTAX'] != a.loc[~a['PTAX Fixada'], 'PTAX']).any()
+
+
+def test_partitions_are_synced_once_inside_the_publish_lock(workbook, monkeypatch):
+    versao = workbook()
+    chamadas = []
+    sincronizar = storage.sync_partitions
+    monkeypatch.setattr(storage, 'sync_partitions', lambda *a, **k: chamadas.append(1) or sincronizar(*a, **k))
+
+    manifesto = dataset.load_manifest(versao)
+    for _ in range(3):
+        new_process()
+        assert dataset.load_manifest(versao) == manifesto
+        dataset.load_data([2025], 5.5, versao)
+    assert chamadas == [1]
+
+
+def test_worker_without_workbook_follows_published_snapshots(workbook, monkeypatch, tmp_path):
+    v1 = workbook()
+    dataset.load_manifest(v1)
+    arquivo = dataset.workbook_path()
+
+    # Processo sem acesso à planilha: versão e dados vêm do ponteiro atual.json
+    monkeypatch.setenv("VENDAS_CAFE_ARQUIVO", str(tmp_path / "ausente.xlsx"))
+    new_process()
+    assert dataset.get_workbook_version() == v1
+    antigo = dataset.open_snapshot(v1)
+    vendas_v1 = dataset.load_data([2025], 5.5, v1)
+
+    # Nova versão publicada por outro processo; o ponteiro muda e o processo sem planilha troca junto
+    monkeypatch.setenv("VENDAS_CAFE_ARQUIVO", arquivo)
+    vendas = pd.read_excel(arquivo, sheet_name='Sheet2')
+    vendas.loc[vendas['Safra'] == 2025, '# Sacas'] *= 2
+    v2 = workbook(Sheet2=vendas)
+    dataset.load_manifest(v2)
+
+    monkeypatch.setenv("VENDAS_CAFE_ARQUIVO", str(tmp_path / "ausente.xlsx"))
+    assert dataset.get_workbook_version() == v2
+    vendas_v2 = dataset.load_data([2025], 5.5, v2)
+    assert vendas_v2['# Sacas'].sum() == 2 * vendas_v1['# Sacas'].sum()
+
+    # A pasta da v1 é removida após duas publicações; o snapshot já aberto continua legível
+    monkeypatch.setenv("VENDAS_CAFE_ARQUIVO", arquivo)
+    dataset.load_manifest(workbook(hedge=pd.read_excel(arquivo, sheet_name='hedge').iloc[:-1]))
+    assert not os.path.exists(antigo.pasta)
+    assert not antigo.frame('hedge').empty and not antigo.frame('futuros').empty
+
+
+def test_snapshot_in_previous_format_is_republished(workbook):
+    versao = workbook()
+    destino = os.path.join(dataset.snapshots_folder(), snapshot.snapshot_id(versao))
+    os.makedirs(destino)
+    with open(os.path.join(destino, snapshot.ARQUIVO_META), 'w', encoding='utf-8') as f:
+        json.dump({'versao_fonte': versao, 'tabelas': []}, f)
+
+    assert snapshot.open_snapshot(dataset.snapshots_folder(), versao) is None
+    instantaneo = dataset.open_snapshot(versao)
+    assert instantaneo.meta['formato'] == snapshot.FORMATO and instantaneo.has('ptax')
+    assert 'Fim' in instantaneo.frame('ptax').columns
+
+
+def test_half_saved_workbook_keeps_serving_the_published_snapshot(workbook):
+    v1 = workbook()
+    vendas_v1 = dataset.load_data([2025], 5.5, v1)
+
+    # Planilha salva pela metade: não é um zip válido, e a versão (mtime) já mudou
+    with open(dataset.workbook_path(), 'wb') as f:
+        f.write(b'PK\x03\x04 salvando')
+    v2 = v1 + 1
+    os.utime(dataset.workbook_path(), (v2, v2))
+    new_process()
+
+    instantaneo = dataset.open_snapshot(v2)
+    assert instantaneo.meta['versao_fonte'] == v1
+    pd.testing.assert_frame_equal(dataset.load_data([2025], 5.5, v2), vendas_v1)
+    assert snapshot.published_version(dataset.snapshots_folder()) == v1
+    assert not [nome for nome in os.listdir(dataset.snapshots_folder()) if nome.endswith('.tmp')]
+
+
+def test_cached_snapshot_is_sized_by_its_mapped_tables(workbook):
+    versao = workbook()
+    instantaneo = dataset.open_snapshot(versao)
+
+    assert instantaneo.mapped_bytes() > 0
+    assert cache.estimate_size(instantaneo) >= instantaneo.mapped_bytes()
+    tamanhos = {chave: tamanho for chave, tamanho, _ in cache.CACHE.entries()}
+    assert tamanhos[('dataset.open_snapshot', ('versao', versao))] >= instantaneo.mapped_bytes()